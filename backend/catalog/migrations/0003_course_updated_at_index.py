@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-18 14:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0002_courseattachment'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['updated_at'], name='catalog_cou_updated_966f03_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+from django.db import migrations
+
+# 只在 PostgreSQL 上建：search_vector 生成列 + GIN，pg_trgm 三元组索引（见 catalog/search.py）
+FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    """
+    ALTER TABLE catalog_course ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(code, '') || ' ' || coalesce(title, '')), 'A')
+        || setweight(to_tsvector('simple', coalesce(description, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX catalog_course_search_gin ON catalog_course USING gin (search_vector)",
+    "CREATE INDEX catalog_course_title_trgm ON catalog_course USING gin (title gin_trgm_ops)",
+    "CREATE INDEX catalog_course_title_upper_trgm ON catalog_course USING gin (UPPER(title) gin_trgm_ops)",
+    "CREATE INDEX catalog_course_code_upper_trgm ON catalog_course USING gin (UPPER(code) gin_trgm_ops)",
+    "CREATE INDEX catalog_course_desc_upper_trgm ON catalog_course USING gin (UPPER(description) gin_trgm_ops)",
+]
+BACKWARD = [
+    "DROP INDEX IF EXISTS catalog_course_desc_upper_trgm",
+    "DROP INDEX IF EXISTS catalog_course_code_upper_trgm",
+    "DROP INDEX IF EXISTS catalog_course_title_upper_trgm",
+    "DROP INDEX IF EXISTS catalog_course_title_trgm",
+    "DROP INDEX IF EXISTS catalog_course_search_gin",
+    "ALTER TABLE catalog_course DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def _run(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != "postgresql":
+            return
+        for sql in statements:
+            schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0003_course_updated_at_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(_run(FORWARD), _run(BACKWARD)),
+    ]
@@ -10,6 +10,8 @@ class Course(models.Model):
 
     class Meta:
         ordering = ["code"]
+        # 增量导出按 updated_at 水位线扫描
+        indexes = [models.Index(fields=["updated_at"])]
 
     def __str__(self):
         return f"{self.code} - {self.title}"
@@ -32,6 +34,7 @@ class CourseAttachment(models.Model):
     size = models.PositiveIntegerField(default=0)
     uploaded_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, related_name="uploaded_course_files")
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ["-created_at"]
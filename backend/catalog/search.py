@@ -0,0 +1,43 @@
+"""
+课程目录检索（PostgreSQL）：
+- catalog_course.search_vector：code/title（权重 A）+ description（权重 B）的 tsvector 生成列，GIN 索引，
+  由数据库维护（见迁移 0004），按词匹配、排序用 ts_rank
+- pg_trgm 三元组 GIN 索引：中文没有分词，按子串 UPPER(col) LIKE 匹配；标题另支持模糊（word_similarity）
+结果按相关度排序，并带 ts_headline 高亮片段。其它数据库退回 DRF SearchFilter（code/title 的 icontains）。
+"""
+from django.db import connections
+from django.db.models import BooleanField, FloatField, TextField
+from django.db.models.expressions import RawSQL
+from rest_framework import filters
+
+HEADLINE_OPTIONS = "StartSel=<mark>, StopSel=</mark>, MaxFragments=2, MaxWords=20, MinWords=5"
+
+
+def _like(term: str) -> str:
+    return "%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+class CourseSearchFilter(filters.SearchFilter):
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms or connections[queryset.db].vendor != "postgresql":
+            return super().filter_queryset(request, queryset, view)
+        qn = connections[queryset.db].ops.quote_name
+        t = qn(queryset.model._meta.db_table)
+        text = " ".join(terms)
+        tsq = "websearch_to_tsquery('simple', %s)"
+        # 每个词都要在 code/title/description 之一里出现（与 SearchFilter 口径一致）
+        substr = " AND ".join(
+            f"(UPPER({t}.code) LIKE UPPER(%s) OR UPPER({t}.title) LIKE UPPER(%s) OR UPPER({t}.description) LIKE UPPER(%s))"
+            for _ in terms)
+        like_params = [p for term in terms for p in [_like(term)] * 3]
+        match = RawSQL(f"{t}.search_vector @@ {tsq} OR %s <%% {t}.title OR ({substr})",
+                       [text, text, *like_params], output_field=BooleanField())
+        rank = RawSQL(f"ts_rank({t}.search_vector, {tsq}) + word_similarity(%s, {t}.title)",
+                      [text, text], output_field=FloatField())
+        headline = RawSQL(
+            f"ts_headline('simple', {t}.title || ' ' || {t}.description, {tsq}, %s)",
+            [text, HEADLINE_OPTIONS], output_field=TextField())
+        return (queryset.filter(match)
+                .annotate(search_rank=rank, search_headline=headline)
+                .order_by("-search_rank", "code"))
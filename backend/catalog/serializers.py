@@ -6,6 +6,14 @@ class CourseSerializer(serializers.ModelSerializer):
         model = Course
         fields = ["id", "code", "title", "description", "credits", "created_at", "updated_at"]
 
+    def to_representation(self, obj):
+        data = super().to_representation(obj)
+        # 全文检索（CourseSearchFilter）时附带相关度与高亮片段
+        if hasattr(obj, "search_headline"):
+            data["search_rank"] = obj.search_rank
+            data["search_headline"] = obj.search_headline
+        return data
+
 from rest_framework import serializers
 from .models import CourseAttachment
 
@@ -18,9 +26,9 @@ class CourseAttachmentSerializer(serializers.ModelSerializer):
         model = CourseAttachment
         fields = [
             "id", "course", "course_code", "title", "file", "file_url",
-            "content_type", "size", "uploaded_by", "uploaded_by_username", "created_at"
+            "content_type", "size", "uploaded_by", "uploaded_by_username", "created_at", "updated_at"
         ]
-        read_only_fields = ["uploaded_by", "size", "content_type", "created_at", "file_url", "course_code", "uploaded_by_username"]
+        read_only_fields = ["uploaded_by", "size", "content_type", "created_at", "updated_at", "file_url", "course_code", "uploaded_by_username"]
 
     def get_file_url(self, obj):
         try:
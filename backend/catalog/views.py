@@ -1,22 +1,26 @@
 from rest_framework import viewsets, filters, permissions
+from core.conditional import ConditionalGetMixin
 from .models import Course
 from .serializers import CourseSerializer
 from .permissions import CoursePermission
+from .search import CourseSearchFilter
 
-class CourseViewSet(viewsets.ModelViewSet):
+class CourseViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Course.objects.all()
     serializer_class = CourseSerializer
     permission_classes = [permissions.IsAuthenticated, CoursePermission]
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+    # PostgreSQL 上走全文 + 三元组索引并按相关度排序，其它数据库按 search_fields 做 icontains
+    filter_backends = [CourseSearchFilter, filters.OrderingFilter]
     search_fields = ["code", "title"]
     ordering_fields = ["code", "title", "updated_at"]
 
+from django.conf import settings
 from rest_framework import viewsets, permissions, filters, parsers
 from .models import CourseAttachment
 from .serializers import CourseAttachmentSerializer
 from .permissions import CourseAttachmentPermission
 
-class CourseAttachmentViewSet(viewsets.ModelViewSet):
+class CourseAttachmentViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     """
     支持：
     - GET /api/course_attachments/?course=<id>  按课程过滤
@@ -29,6 +33,9 @@ class CourseAttachmentViewSet(viewsets.ModelViewSet):
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ["title", "course__code"]
     ordering_fields = ["created_at", "size"]
+    conditional_related = ("course",)
+    # file_url 是预签名 URL，缓存的表示不能比签名活得久
+    conditional_ttl = getattr(settings, "AWS_QUERYSTRING_EXPIRE", 3600) // 2
 
     def get_queryset(self):
         qs = CourseAttachment.objects.select_related("course", "uploaded_by")
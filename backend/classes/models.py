@@ -17,6 +17,7 @@ class ClassSection(models.Model):
     end_date = models.DateField(null=True, blank=True)
     status = models.CharField(max_length=16, choices=STATUS, default="draft")
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         unique_together = ("course", "term","section_code")  # 同一课程下的班号唯一
@@ -10,5 +10,5 @@ class ClassSectionSerializer(serializers.ModelSerializer):
         fields = [
             "id", "course", "course_title",
             "section_code", "term", "teacher", "teacher_username",
-            "capacity", "start_date", "end_date", "status", "created_at"
+            "capacity", "start_date", "end_date", "status", "created_at", "updated_at"
         ]
\ No newline at end of file
@@ -1,14 +1,16 @@
 from rest_framework import viewsets, filters, permissions
+from core.conditional import ConditionalGetMixin
 from .models import ClassSection
 from .serializers import ClassSectionSerializer
 from .permissions import ClassSectionPermission
 
-class ClassSectionViewSet(viewsets.ModelViewSet):
+class ClassSectionViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = ClassSectionSerializer
     permission_classes = [permissions.IsAuthenticated, ClassSectionPermission]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ["term", "section_code", "course__code", "course__title", "teacher__username"]
     ordering_fields = ["created_at", "term", "section_code", "capacity"]
+    conditional_related = ("course",)
 
     def get_queryset(self):
         """
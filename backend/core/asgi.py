@@ -9,8 +9,14 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 
 import os
 
+from django.conf import settings
+from django.contrib.staticfiles.handlers import ASGIStaticFilesHandler
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
 application = get_asgi_application()
+
+# 开发环境也用 uvicorn（SSE 需要 ASGI），像 runserver 一样顺带提供静态文件
+if settings.DEBUG:
+    application = ASGIStaticFilesHandler(application)
@@ -0,0 +1,51 @@
+"""
+条件请求（ETag / Last-Modified）：读多写少的列表与详情内容没变时直接回 304，不查明细、不序列化。
+- 列表：校验器来自过滤后查询集上的一条聚合（行数 + max(updated_at)，以及序列化时展开的关联对象的
+  max(updated_at)），再加上查询参数与用户角色（不同角色可见的行不同）
+- 详情：对象及其关联对象的 updated_at
+列表只按 ETag 判断 304：删除行不会让 max(updated_at) 变大，Last-Modified 只作参考。
+"""
+import hashlib
+import json
+import time
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+
+class ConditionalGetMixin:
+    conditional_related = ()   # 序列化时展开的外键，如 ("course",)
+    conditional_ttl = None     # 表示里有会过期的内容（如预签名 URL）时，ETag 每 ttl 秒轮换一次
+
+    def list(self, request, *args, **kwargs):
+        qs = self.filter_queryset(self.get_queryset())
+        agg = qs.order_by().aggregate(
+            n=Count("pk"), m=Max("updated_at"),
+            **{f"{r}_m": Max(f"{r}__updated_at") for r in self.conditional_related})
+        parts = [getattr(request.user, "role", None), sorted(request.query_params.lists()), agg]
+        stamps = [v for k, v in agg.items() if k != "n" and v]
+        return self._conditional(request, parts, max(stamps, default=None), False,
+                                 lambda: super(ConditionalGetMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        obj = self.get_object()
+        stamps = [obj.updated_at, *(getattr(obj, r).updated_at for r in self.conditional_related)]
+        return self._conditional(request, [obj.pk, stamps], max(stamps), True,
+                                 lambda: Response(self.get_serializer(obj).data))
+
+    def _conditional(self, request, parts, last_modified, check_modified, render):
+        if self.conditional_ttl:
+            parts.append(int(time.time() // self.conditional_ttl))
+        etag = quote_etag(hashlib.sha1(json.dumps(parts, default=str).encode()).hexdigest())
+        ts = int(last_modified.timestamp()) if last_modified else None
+        resp = get_conditional_response(request, etag=etag, last_modified=ts if check_modified else None)
+        if resp is None:
+            resp = render()
+        resp["ETag"] = etag
+        if ts is not None:
+            resp["Last-Modified"] = http_date(ts)
+        patch_cache_control(resp, private=True, no_cache=True)
+        patch_vary_headers(resp, ("Authorization",))
+        return resp
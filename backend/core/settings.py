@@ -144,6 +144,28 @@ CELERY_TASK_TIME_LIMIT = 60 * 10           # 单任务硬超时：10分钟
 CELERY_TASK_SOFT_TIME_LIMIT = 60 * 9       # 软超时
 CELERY_TASK_TRACK_STARTED = True           # 允许显示 STARTED 状态
 CELERY_RESULT_EXPIRES = 60 * 60 * 6        # 结果保留 6 小时
+TASK_PROGRESS_REDIS_URL = CELERY_BROKER_URL  # 任务进度 pub/sub（SSE 推送）
+# 定时任务（celery -A core beat）
+CELERY_BEAT_SCHEDULE = {
+    "purge-export-cache": {"task": "jobs.tasks.purge_export_cache", "schedule": 60 * 10},
+    "reconcile-unread-counters": {"task": "notices.tasks.reconcile_unread_counters", "schedule": 60 * 60},
+    "publish-due-announcements": {"task": "notices.tasks.publish_due_announcements", "schedule": 60},
+    "archive-deliveries": {"task": "notices.tasks.archive_deliveries", "schedule": 60 * 60 * 24},
+}
+
+# 导出结果缓存有效期（秒），应小于 CELERY_RESULT_EXPIRES，保证命中时任务结果仍可查询
+EXPORT_CACHE_TTL = env.int('EXPORT_CACHE_TTL', default=60 * 60)
+# 增量导出水位线相对扫描开始时刻的安全余量（秒），应大于最长的写事务时长
+EXPORT_WATERMARK_LAG = env.int('EXPORT_WATERMARK_LAG', default=5 * 60)
+
+# 全体学生公告的投递方式：push = 发布时为每个学生写一条 Delivery；
+# pull = 不写投递，收件箱读取时按已发布公告计算，学生标记已读后才落一行状态
+NOTICES_BROADCAST_MODE = env('NOTICES_BROADCAST_MODE', default='push')
+# 未确认提醒：同一人两次提醒的最短间隔（秒）、发信限速（封/秒，0 为不限）
+NOTICES_REMIND_COOLDOWN = env.int('NOTICES_REMIND_COOLDOWN', default=60 * 60 * 6)
+NOTICES_REMIND_RATE = env.float('NOTICES_REMIND_RATE', default=20)
+# 已确认的 push 投递超过多少天搬进归档表（已撤回公告的投递随时归档）
+NOTICES_ARCHIVE_AFTER_DAYS = env.int('NOTICES_ARCHIVE_AFTER_DAYS', default=180)
 
 # -------------------------------------------------------------------
 # 语言、时区、静态文件
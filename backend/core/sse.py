@@ -0,0 +1,41 @@
+"""
+Server-Sent Events 的公共部分（notices/realtime.py、jobs/views.py 共用）。
+SSE 视图都是异步视图 + 异步生成器，必须以 ASGI 运行（开发、生产都用 uvicorn core.asgi:application）：
+WSGI / runserver 下 Django 会先把整个流读完才发送，连接期间什么也收不到。
+"""
+import json
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+
+@sync_to_async
+def authenticate(request):
+    """EventSource 不能带请求头，token 也可以放在 ?token= 里。"""
+    auth = JWTAuthentication()
+    raw = request.GET.get("token")
+    try:
+        if raw:
+            return auth.get_user(auth.get_validated_token(raw))
+        result = auth.authenticate(request)
+        return result[0] if result else None
+    except (InvalidToken, TokenError):
+        return None
+
+
+def unauthorized() -> JsonResponse:
+    return JsonResponse({"detail": "身份认证信息未提供或无效"}, status=401)
+
+
+def message(data: dict, event: str | None = None) -> str:
+    head = f"event: {event}\n" if event else ""
+    return f"{head}data: {json.dumps(data, default=str, ensure_ascii=False)}\n\n"
+
+
+def stream(events) -> StreamingHttpResponse:
+    resp = StreamingHttpResponse(events, content_type="text/event-stream")
+    resp["Cache-Control"] = "no-cache"
+    resp["X-Accel-Buffering"] = "no"  # 关闭 nginx 缓冲
+    return resp
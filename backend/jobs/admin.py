@@ -1,3 +1,10 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("task_id", "kind", "status", "user", "rows", "created_at", "started_at", "finished_at")
+    list_filter = ("kind", "status")
+    search_fields = ("task_id", "user__username")
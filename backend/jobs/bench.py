@@ -0,0 +1,108 @@
+"""
+导入/导出基准测试的公共部分：合成课程 CSV 生成器 + 单次测量。
+供 gen_courses_csv / bench_courses 两个管理命令使用。
+"""
+import csv
+import io
+import random
+import time
+
+from django.db import connection
+
+BENCH_PREFIX = "BENCH"
+SIZES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+
+
+def parse_size(s: str) -> int:
+    return SIZES.get(s.lower()) or int(s)
+
+
+def synthetic_rows(n: int, dup_ratio: float = 0.0, invalid_ratio: float = 0.0,
+                   seed: int = 42, prefix: str = BENCH_PREFIX):
+    """
+    逐行产出 [id, code, title, description, credits]：
+    - dup_ratio 比例的行复用前面出现过的 code（测试批内/跨批去重与覆盖）
+    - invalid_ratio 比例的行不合法（缺 code / 缺 title / 学分越界，轮流出现）
+    """
+    rnd = random.Random(seed)
+    issued = 0
+    for i in range(n):
+        r = rnd.random()
+        if r < invalid_ratio:
+            kind = i % 3
+            code = "" if kind == 0 else f"{prefix}{i:08d}"
+            title = "" if kind == 1 else f"Bad course {i}"
+            credits = "999" if kind == 2 else "3"
+            yield ["", code, title, "", credits]
+            continue
+        if issued and r < invalid_ratio + dup_ratio:
+            code = f"{prefix}{rnd.randrange(issued):08d}"
+        else:
+            code = f"{prefix}{issued:08d}"
+            issued += 1
+        yield ["", code, f"Synthetic course {i} 合成课程", f"Row {i} for benchmarking",
+               f"{rnd.choice((1, 2, 3, 4)) + rnd.choice((0, 0.5)):.1f}"]
+
+
+def write_csv(out, rows, bom: bool = True):
+    """把行写进二进制流 out（带 BOM，与正式导入文件一致）。"""
+    text = io.TextIOWrapper(out, encoding="utf-8-sig" if bom else "utf-8", newline="", write_through=False)
+    w = csv.writer(text)
+    w.writerow(["id", "code", "title", "description", "credits"])
+    w.writerows(rows)
+    text.flush()
+    text.detach()
+
+
+class QueryCounter:
+    """connection.execute_wrapper 用的计数器：只计条数，不像 CaptureQueriesContext 那样保存 SQL、有条数上限。"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def reset_peak_rss() -> bool:
+    """把本进程的 RSS 峰值（VmHWM）重置为当前 RSS（Linux 4.0+，写 /proc/self/clear_refs）；不支持时返回 False。"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb() -> float | None:
+    """自上次 reset_peak_rss 以来的 RSS 峰值（含 psycopg2 / pyarrow / zstd 等 C 扩展的内存）。"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def measure(fn, rows: int) -> dict:
+    """
+    执行 fn()，返回耗时、吞吐、SQL 条数、本次操作的 RSS 峰值 peak_rss_mb 以及 fn 的返回值。
+    峰值在操作前重置，不受前面操作的影响；平台不支持重置时为 None（不退回进程生命周期内的峰值）。
+    """
+    counter = QueryCounter()
+    tracked = reset_peak_rss()
+    with connection.execute_wrapper(counter):
+        t0 = time.perf_counter()
+        result = fn()
+        seconds = time.perf_counter() - t0
+    return {
+        "rows": rows,
+        "seconds": round(seconds, 3),
+        "rows_per_sec": round(rows / seconds, 1) if seconds else None,
+        "queries": counter.count,
+        "peak_rss_mb": peak_rss_mb() if tracked else None,
+        "result": result,
+    }
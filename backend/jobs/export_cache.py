@@ -0,0 +1,63 @@
+"""
+导出结果缓存（见 ExportCacheEntry）。
+"""
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from catalog.models import Course
+from .models import ExportCacheEntry
+
+
+def catalog_version() -> list:
+    """课程目录版本：任何增删改都会改变 (max(updated_at), count) 之一。"""
+    agg = Course.objects.aggregate(m=Max("updated_at"), n=Count("id"))
+    return [agg["m"].isoformat() if agg["m"] else None, agg["n"]]
+
+
+def normalize_filters(filters: dict | None) -> dict:
+    """去掉首尾空白与空值。ExportCoursesAPI 用它规范化一次，同一份结果既算缓存 key 也交给导出任务。"""
+    return {k: str(v).strip() for k, v in (filters or {}).items() if str(v).strip()}
+
+
+def cache_key(filters: dict, fmt: str, since: str | None) -> str:
+    # filters 已经过 normalize_filters；code/title 为 icontains 筛选，大小写不影响结果
+    norm = {k: v.lower() for k, v in normalize_filters(filters).items()}
+    raw = json.dumps({"filters": norm, "format": fmt, "since": since, "version": catalog_version()},
+                     sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def reserve(key: str, task_id: str) -> tuple[ExportCacheEntry, bool]:
+    """
+    取命中的缓存条目，或以 task_id 占住该 key。
+    返回 (entry, created)：created 为 True 时调用方需要真正投递 task_id 对应的任务。
+    """
+    now = timezone.now()
+    expires = now + timedelta(seconds=settings.EXPORT_CACHE_TTL)
+    for _ in range(2):
+        entry = ExportCacheEntry.objects.filter(key=key).first()
+        if entry and entry.expires_at > now:
+            return entry, False
+        if entry:
+            entry.evict()
+        try:
+            with transaction.atomic():
+                return ExportCacheEntry.objects.create(key=key, task_id=task_id, expires_at=expires), True
+        except IntegrityError:
+            # 并发的相同请求抢先占住了 key：再读一次，挂到它的任务上
+            continue
+    return ExportCacheEntry.objects.get(key=key), False
+
+
+def purge_expired() -> int:
+    n = 0
+    for entry in ExportCacheEntry.objects.filter(expires_at__lte=timezone.now()).iterator():
+        entry.evict()
+        n += 1
+    return n
@@ -0,0 +1,111 @@
+"""
+课程批量导入引擎：解析 -> 按 code 去重 -> 每批一条 INSERT ... ON CONFLICT (code) DO UPDATE。
+"""
+import math
+from decimal import Decimal
+
+from django.db import DatabaseError, transaction
+
+from catalog.models import Course
+
+IMPORT_BATCH_SIZE = 2000   # 每批写库的行数
+MAX_ERRORS = 100           # 结果里最多保留的错误明细条数
+
+_CODE_MAX = Course._meta.get_field("code").max_length
+_TITLE_MAX = Course._meta.get_field("title").max_length
+_UPSERT_FIELDS = ["title", "description", "credits", "updated_at"]
+
+
+class RowError(ValueError):
+    pass
+
+
+def parse_row(row: dict) -> dict:
+    """把一行 CSV 规范化为 Course 字段；不合法时抛 RowError。"""
+    code = (row.get("code") or "").strip()
+    title = (row.get("title") or "").strip()
+    if not code or not title:
+        raise RowError("code/title 不能为空")
+    if len(code) > _CODE_MAX:
+        raise RowError(f"code 超过 {_CODE_MAX} 个字符")
+    if len(title) > _TITLE_MAX:
+        raise RowError(f"title 超过 {_TITLE_MAX} 个字符")
+    description = (row.get("description") or "").strip()
+    credits_str = (row.get("credits") or "3.0").strip()
+    try:
+        credits = float(credits_str)
+    except ValueError:
+        credits = 3.0
+    if not math.isfinite(credits) or abs(credits) >= 100:
+        raise RowError(f"credits 超出范围: {credits_str}")
+    # DecimalField 用字符串最稳
+    return {"code": code, "title": title, "description": description,
+            "credits": Decimal(str(credits)).quantize(Decimal("0.1"))}
+
+
+class CourseImporter:
+    """
+    逐行 feed，攒满一批后落库。ok/fail 口径与逐行导入一致：
+    批内同 code 的多行只写最后一行（与逐行覆盖的结果相同），该行落库后这些行都算成功，
+    落库失败时这些行都算失败。
+    """
+
+    def __init__(self, batch_size: int | None = None, on_batch=None):
+        self.batch_size = batch_size or IMPORT_BATCH_SIZE
+        self.on_batch = on_batch     # 每批落库后回调 on_batch(importer)，用于进度上报
+        self.ok = 0
+        self.fail = 0
+        self.errors = []
+        self._pending = {}           # code -> ([line, ...], fields)
+        self._rows = 0               # 当前批已接收的合法行数（含重复 code）
+
+    def feed(self, line: int, row: dict):
+        try:
+            fields = parse_row(row)
+        except RowError as e:
+            self._error(line, row.get("code"), str(e))
+            return
+        lines, _ = self._pending.get(fields["code"], ([], None))
+        self._pending[fields["code"]] = (lines + [line], fields)
+        self._rows += 1
+        if self._rows >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._rows:
+            return
+        pending, rows = self._pending, self._rows
+        self._pending, self._rows = {}, 0
+        try:
+            with transaction.atomic():
+                self._upsert([f for _, f in pending.values()])
+            self.ok += rows
+        except DatabaseError:
+            # 整批失败时退回逐 code 写入，把错误定位到具体行；只有真正落库的 code 计入 ok
+            for lines, fields in pending.values():
+                try:
+                    with transaction.atomic():
+                        self._upsert([fields])
+                    self.ok += len(lines)
+                except DatabaseError as e:
+                    for line in lines:
+                        self._error(line, fields["code"], str(e).strip())
+        if self.on_batch:
+            self.on_batch(self)
+
+    def result(self) -> dict:
+        self.flush()
+        return {"status": "success", "ok": self.ok, "fail": self.fail, "errors": self.errors}
+
+    def _upsert(self, items):
+        Course.objects.bulk_create(
+            [Course(**f) for f in items],
+            update_conflicts=True,
+            unique_fields=["code"],
+            update_fields=_UPSERT_FIELDS,
+        )
+
+    def _error(self, line, code, msg):
+        self.fail += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append({"line": line, "code": code or "", "error": msg})
@@ -0,0 +1,104 @@
+import json
+import platform
+import subprocess
+from datetime import datetime, timezone
+
+import django
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from catalog.models import Course
+from jobs.bench import BENCH_PREFIX, measure, parse_size, synthetic_rows, write_csv
+from jobs.tasks import export_courses_task, import_courses_task
+from jobs.utils_storage import open_stream
+from jobs.writers import EXPORT_FORMATS
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+
+def _storage_path(url: str) -> str | None:
+    """本地存储的下载地址去掉 MEDIA_URL 即为存储路径；其他存储（S3 预签名等）不清理。"""
+    base = getattr(default_storage, "base_url", None)
+    return url[len(base):] if base and url.startswith(base) else None
+
+
+class Command(BaseCommand):
+    help = (
+        "导入/导出基准测试（进程内直接执行任务，不经过 broker），输出 JSON 便于跨提交对比。\n"
+        "例：bench_courses --sizes 10k,100k --dup-ratio 0.05 --invalid-ratio 0.01 --formats csv,parquet -o bench.json\n"
+        "会向当前数据库写入以 --prefix 开头的课程，结束后默认删除。"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="10k", help="逗号分隔：10k,100k,1m 或整数")
+        parser.add_argument("--dup-ratio", type=float, default=0.0)
+        parser.add_argument("--invalid-ratio", type=float, default=0.0)
+        parser.add_argument("--formats", default="csv", help=f"导出格式，逗号分隔：{','.join(EXPORT_FORMATS)}")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--prefix", default=BENCH_PREFIX)
+        parser.add_argument("-o", "--output", help="结果写入该 JSON 文件（默认打印到标准输出）")
+        parser.add_argument("--keep", action="store_true", help="保留测试数据与文件")
+
+    def handle(self, *args, **opts):
+        prefix = opts["prefix"]
+        formats = [f for f in opts["formats"].split(",") if f]
+        for f in formats:
+            if f not in EXPORT_FORMATS:
+                raise SystemExit(f"未知导出格式: {f}")
+        if Course.objects.filter(code__startswith=prefix).exists():
+            raise SystemExit(f"数据库里已有 {prefix}* 课程，请先清理或换 --prefix")
+
+        results = []
+        for size in opts["sizes"].split(","):
+            n = parse_size(size)
+            files = []
+            try:
+                with open_stream(f"bench/courses_{n}.csv", "text/csv") as out:
+                    write_csv(out, synthetic_rows(n, opts["dup_ratio"], opts["invalid_ratio"], opts["seed"], prefix))
+                path = out.name
+                files.append(path)
+
+                # 首次导入（全是插入）与重复导入（全是冲突更新）
+                for op in ("import", "reimport"):
+                    m = measure(lambda: import_courses_task(path), n)
+                    res = m.pop("result")
+                    results.append({"op": op, "size": n, **m, "ok": res["ok"], "fail": res["fail"]})
+                    self.stderr.write(f"{op:9s} {n:>9d} rows  {m['rows_per_sec']} rows/s  {m['queries']} queries  "
+                                      f"peak {m['peak_rss_mb']} MB")
+
+                count = Course.objects.filter(code__startswith=prefix).count()
+                for fmt in formats:
+                    m = measure(lambda: export_courses_task({"code": prefix}, fmt), count)
+                    res = m.pop("result")
+                    files.append(_storage_path(res["download_url"]))
+                    results.append({"op": "export", "format": fmt, "size": n, **m})
+                    self.stderr.write(f"export    {n:>9d} rows  {m['rows_per_sec']} rows/s  peak {m['peak_rss_mb']} MB  [{fmt}]")
+            finally:
+                if not opts["keep"]:
+                    Course.objects.filter(code__startswith=prefix).delete()
+                    for p in files:
+                        if p:
+                            default_storage.delete(p)
+
+        report = {
+            "commit": _git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "db": connection.vendor,
+            "params": {k: opts[k] for k in ("sizes", "dup_ratio", "invalid_ratio", "formats", "seed")},
+            "results": results,
+        }
+        data = json.dumps(report, ensure_ascii=False, indent=2)
+        if opts["output"]:
+            with open(opts["output"], "w", encoding="utf-8") as f:
+                f.write(data)
+            self.stderr.write(self.style.SUCCESS(f"结果已写入 {opts['output']}"))
+        else:
+            self.stdout.write(data)
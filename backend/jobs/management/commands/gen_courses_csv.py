@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from jobs.bench import BENCH_PREFIX, parse_size, synthetic_rows, write_csv
+
+
+class Command(BaseCommand):
+    help = "生成合成课程 CSV（导入压测用），如：gen_courses_csv 100k -o /tmp/courses_100k.csv --dup-ratio 0.05"
+
+    def add_arguments(self, parser):
+        parser.add_argument("size", help="行数：10k / 100k / 1m 或任意整数")
+        parser.add_argument("-o", "--output", required=True, help="输出文件路径（本地文件系统）")
+        parser.add_argument("--dup-ratio", type=float, default=0.0, help="重复 code 的行占比")
+        parser.add_argument("--invalid-ratio", type=float, default=0.0, help="不合法行占比")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--prefix", default=BENCH_PREFIX, help="课程代码前缀，便于事后清理")
+
+    def handle(self, *args, **opts):
+        n = parse_size(opts["size"])
+        rows = synthetic_rows(n, opts["dup_ratio"], opts["invalid_ratio"], opts["seed"], opts["prefix"])
+        with open(opts["output"], "wb") as f:
+            write_csv(f, rows)
+        self.stdout.write(self.style.SUCCESS(f"已生成 {n} 行 -> {opts['output']}"))
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.7 on 2026-10-18 14:06
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0002_exportcacheentry'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_id', models.CharField(max_length=255, unique=True)),
+                ('kind', models.CharField(choices=[('import', 'import'), ('export', 'export')], max_length=16)),
+                ('params', models.JSONField(blank=True, default=dict)),
+                ('status', models.CharField(choices=[('pending', 'pending'), ('started', 'started'), ('success', 'success'), ('failure', 'failure')], default='pending', max_length=16)),
+                ('rows', models.PositiveIntegerField(default=0)),
+                ('ok', models.PositiveIntegerField(default=0)),
+                ('fail', models.PositiveIntegerField(default=0)),
+                ('artifact', models.CharField(blank=True, max_length=1000)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['user', '-created_at'], name='jobs_job_user_id_58dc09_idx'), models.Index(fields=['kind', 'created_at'], name='jobs_job_kind_fbc839_idx')],
+            },
+        ),
+    ]
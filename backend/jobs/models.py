@@ -1,3 +1,122 @@
+import hashlib
+import json
+
+from django.conf import settings
 from django.db import models
 
-# Create your models here.
+
+class ExportWatermark(models.Model):
+    """
+    增量导出的水位线：记录某用户在某个导出范围（scope）上最后一次成功导出到的 updated_at。
+    下次 incremental 导出只取 updated_at 更新的课程。
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="export_watermarks")
+    scope = models.CharField(max_length=255)  # 导出对象 + 规范化后的筛选条件
+    watermark = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("user", "scope")
+
+    def __str__(self):
+        return f"{self.user_id}:{self.scope} @ {self.watermark.isoformat()}"
+
+    @staticmethod
+    def scope_for(filters: dict | None) -> str:
+        # 同一组筛选条件共用一条水位线；空值不参与
+        items = {k: v for k, v in (filters or {}).items() if v not in (None, "")}
+        scope = "courses:" + json.dumps(items, sort_keys=True, ensure_ascii=False)
+        if len(scope) > 255:
+            scope = "courses:sha1:" + hashlib.sha1(scope.encode("utf-8")).hexdigest()
+        return scope
+
+
+class ExportCacheEntry(models.Model):
+    """
+    导出结果缓存：key = 规范化筛选条件 + 格式 + 课程目录版本（max(updated_at), count）的哈希。
+    同样的导出请求在 TTL 内直接复用已有文件，或挂到正在执行的同一个任务上。
+    path 为空表示任务仍在执行。
+    """
+    key = models.CharField(max_length=64, unique=True)
+    task_id = models.CharField(max_length=255)
+    path = models.CharField(max_length=500, blank=True)
+    download_url = models.CharField(max_length=1000, blank=True)
+    count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.key[:12]} -> {self.path or self.task_id}"
+
+    def evict(self):
+        """删除缓存条目及其存储对象。"""
+        from django.core.files.storage import default_storage
+
+        if self.path:
+            default_storage.delete(self.path)
+        self.delete()
+
+
+class Job(models.Model):
+    """
+    导入/导出任务登记表：谁在什么时候用什么参数发起了任务、耗时、行数、产物。
+    Celery 结果后端 6 小时后过期，这里长期保留，用于任务列表、批量查状态和容量规划。
+    """
+    KIND_IMPORT = "import"
+    KIND_EXPORT = "export"
+    KIND_CHOICES = [(KIND_IMPORT, "import"), (KIND_EXPORT, "export")]
+    STATUS_CHOICES = [
+        ("pending", "pending"),   # 已投递
+        ("started", "started"),   # worker 已开始执行
+        ("success", "success"),
+        ("failure", "failure"),
+    ]
+
+    task_id = models.CharField(max_length=255, unique=True)
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, related_name="jobs")
+    params = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default="pending")
+
+    rows = models.PositiveIntegerField(default=0)   # 导出行数；导入为 ok + fail
+    ok = models.PositiveIntegerField(default=0)
+    fail = models.PositiveIntegerField(default=0)
+    artifact = models.CharField(max_length=1000, blank=True)  # 导出文件地址
+    result = models.JSONField(null=True, blank=True)          # 任务返回值原样保存，供状态查询
+    error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [models.Index(fields=["user", "-created_at"]), models.Index(fields=["kind", "created_at"])]
+
+    def __str__(self):
+        return f"{self.kind}:{self.task_id} ({self.status})"
+
+    @property
+    def duration_seconds(self) -> float | None:
+        if self.started_at and self.finished_at:
+            return (self.finished_at - self.started_at).total_seconds()
+        return None
+
+    @property
+    def rows_per_second(self) -> float | None:
+        d = self.duration_seconds
+        return round(self.rows / d, 1) if d else None
+
+    def status_payload(self, absolutize=lambda u: u) -> dict:
+        """与 TaskStatusAPI 同构的状态快照（用于已结束的任务）：成功时原样返回任务结果。"""
+        if self.status == "failure":
+            return {"state": "FAILURE", "error": self.error}
+        if self.result is not None:
+            result = dict(self.result)
+        elif self.kind == self.KIND_EXPORT:   # 早于 result 字段登记的任务
+            result = {"status": "success", "download_url": self.artifact, "count": self.rows}
+        else:
+            result = {"status": "success", "ok": self.ok, "fail": self.fail}
+        if "download_url" in result:
+            result["download_url"] = absolutize(result["download_url"])
+        return {"state": "SUCCESS", "result": result}
@@ -0,0 +1,69 @@
+"""
+任务进度推送：worker 在更新结果后端的同时，把状态变化 PUBLISH 到 Redis 频道
+task-progress:<task_id>，TaskEventsAPI（SSE）订阅这些频道把变化实时推给前端，
+前端不再需要轮询 TaskStatusAPI。
+"""
+import json
+import logging
+
+from celery.signals import task_postrun, task_prerun
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATES = ("SUCCESS", "FAILURE", "REVOKED")
+
+_client = None
+
+
+def get_redis():
+    global _client
+    if _client is None:
+        import redis
+        _client = redis.Redis.from_url(settings.TASK_PROGRESS_REDIS_URL)
+    return _client
+
+
+def get_async_redis():
+    """给 ASGI 下的 SSE 视图用的 redis.asyncio 客户端（每个订阅者一个，用完 aclose）。"""
+    import redis.asyncio as aioredis
+    return aioredis.Redis.from_url(settings.TASK_PROGRESS_REDIS_URL)
+
+
+def channel(task_id: str) -> str:
+    return f"task-progress:{task_id}"
+
+
+def publish(task_id: str, payload: dict):
+    """推送失败只记日志：进度推送是锦上添花，不能影响任务本身。"""
+    try:
+        get_redis().publish(channel(task_id), json.dumps(payload, default=str))
+    except Exception:
+        logger.warning("publish progress failed for %s", task_id, exc_info=True)
+
+
+def report(task, meta: dict, state: str = "PROGRESS"):
+    """在任务内上报进度：写结果后端（供 TaskStatusAPI 查询）+ 推送给订阅者。"""
+    task_id = task.request.id
+    if not task_id:  # 直接调用（非 worker 执行）时没有任务 id
+        return
+    task.update_state(state=state, meta=meta)
+    publish(task_id, {"id": task_id, "state": state, "meta": meta})
+
+
+@task_prerun.connect
+def _on_prerun(task_id=None, task=None, **kwargs):
+    if task is not None and task.name.startswith("jobs."):
+        publish(task_id, {"id": task_id, "state": "STARTED"})
+
+
+@task_postrun.connect
+def _on_postrun(task_id=None, task=None, retval=None, state=None, **kwargs):
+    if task is None or not task.name.startswith("jobs.") or state not in TERMINAL_STATES:
+        return  # 被 replace 的任务（IGNORED）、重试中（RETRY）不算结束
+    payload = {"id": task_id, "state": state}
+    if state == "SUCCESS":
+        payload["result"] = retval
+    else:
+        payload["error"] = str(retval)
+    publish(task_id, payload)
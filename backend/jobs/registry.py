@@ -0,0 +1,47 @@
+"""
+任务登记（Job）的生命周期维护：API 投递时建档，worker 侧通过 Celery 信号回写开始/结束信息。
+"""
+from uuid import uuid4
+
+from celery.signals import task_postrun, task_prerun
+from django.utils import timezone
+
+from .models import Job
+
+
+def dispatch(task, args=(), kwargs=None, *, kind: str, user, params: dict, task_id: str | None = None):
+    """
+    先建 Job 再投递（worker 的 prerun 信号需要能找到这条记录），投递失败则撤销登记。
+    返回 Job。
+    """
+    job = Job.objects.create(task_id=task_id or str(uuid4()), kind=kind, user=user, params=params)
+    try:
+        task.apply_async(args, kwargs or {}, task_id=job.task_id)
+    except Exception:
+        job.delete()
+        raise
+    return job
+
+
+@task_prerun.connect
+def _on_prerun(task_id=None, task=None, **kwargs):
+    if task is not None and task.name.startswith("jobs."):
+        Job.objects.filter(task_id=task_id, started_at__isnull=True).update(status="started", started_at=timezone.now())
+
+
+@task_postrun.connect
+def _on_postrun(task_id=None, task=None, retval=None, state=None, **kwargs):
+    # 被 replace 的分片导入协调任务（IGNORED）不算结束：汇总回调沿用同一个 task_id，届时再回写
+    if task is None or not task.name.startswith("jobs.") or state not in ("SUCCESS", "FAILURE"):
+        return
+    fields = {"status": state.lower(), "finished_at": timezone.now()}
+    if state == "SUCCESS" and isinstance(retval, dict):
+        fields["result"] = retval
+        if "count" in retval:  # 导出
+            fields.update(rows=retval["count"], artifact=retval.get("download_url") or "")
+        else:  # 导入
+            ok, fail = retval.get("ok", 0), retval.get("fail", 0)
+            fields.update(ok=ok, fail=fail, rows=ok + fail)
+    elif state == "FAILURE":
+        fields["error"] = str(retval)[:2000]
+    Job.objects.filter(task_id=task_id).update(**fields)
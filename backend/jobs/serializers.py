@@ -0,0 +1,14 @@
+from rest_framework import serializers
+from .models import Job
+
+
+class JobSerializer(serializers.ModelSerializer):
+    username = serializers.CharField(source="user.username", read_only=True, default=None)
+    duration_seconds = serializers.FloatField(read_only=True)
+    rows_per_second = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = Job
+        fields = ["id", "task_id", "kind", "status", "user", "username", "params",
+                  "rows", "ok", "fail", "artifact", "error",
+                  "created_at", "started_at", "finished_at", "duration_seconds", "rows_per_second"]
@@ -1,15 +1,51 @@
-import csv, io
-from datetime import datetime
-from celery import shared_task
-from django.db import transaction
+import csv, io, zlib
+from datetime import datetime, timedelta
+from uuid import uuid4
+from celery import chord, group, shared_task
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from catalog.models import Course
-from .utils_storage import save_bytes, read_bytes
+from .export_cache import purge_expired
+from .models import ExportCacheEntry, ExportWatermark
+from .progress import report
+from . import registry  # noqa: F401  注册 Job 生命周期信号
+from .importer import CourseImporter, MAX_ERRORS
+from .writers import DEFAULT_FORMAT, EXPORT_FORMATS, make_writer
+from .utils_storage import S3_MIN_PART, iter_lines, open_stream
+
+EXPORT_HEADER = ["id", "code", "title", "description", "credits", "updated_at"]
+EXPORT_CHUNK_ROWS = 2000  # 每批（行组）行数：攒够一批交给写出器编码并写入存储流
+
+
+def _chunks(it, size):
+    batch = []
+    for row in it:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
 
 @shared_task(bind=True)
-def export_courses_task(self, filters: dict | None = None):
+def export_courses_task(self, filters: dict | None = None, fmt: str = DEFAULT_FORMAT,
+                        since: str | None = None, watermark_user_id: int | None = None,
+                        cache_key: str | None = None):
     """
-    导出课程为 CSV，返回 {"download_url": "..."}
+    导出课程，返回 {"download_url": "...", "count": N, "format": fmt, "watermark": ...}
+    fmt: csv / csv.gz / csv.zst / parquet / xlsx（见 writers.EXPORT_FORMATS）
+    since: ISO 时间，只导出 updated_at 晚于它的课程（增量）；结果里的 watermark 可作为下次的 since。
+      watermark 不超过“开始扫描时刻 - EXPORT_WATERMARK_LAG”：updated_at 在事务里取值、提交却可能更晚，
+      扫描时还没提交的行下次仍会被导出（窗口内的行可能重复导出，消费方按 code upsert）
+    watermark_user_id: 导出成功后把新水位线记到该用户名下（incremental 模式）
+    cache_key: 由 ExportCoursesAPI 预占的结果缓存条目，成功后回填文件地址，失败则释放
+    单遍流式：按行组编码后直接写入存储（S3 multipart / 本地分块写），
+    行数与水位线在同一遍中累计，峰值内存与课程总量无关。
     """
+    ext, content_type = EXPORT_FORMATS[fmt]
     qs = Course.objects.all().order_by("id")
     # （可选）基于 filters 做筛选：code/title/credits 等
     if filters:
@@ -17,66 +53,154 @@ def export_courses_task(self, filters: dict | None = None):
         if code: qs = qs.filter(code__icontains=code)
         title = filters.get("title")
         if title: qs = qs.filter(title__icontains=title)
+    scan_start = timezone.now()
+    watermark = parse_datetime(since) if since else None
+    if watermark:
+        # 增量：走 updated_at 索引
+        qs = qs.filter(updated_at__gt=watermark).order_by("updated_at", "id")
+    rows = qs.values_list(*EXPORT_HEADER)
 
-    buf = io.StringIO()
-    w = csv.writer(buf)
-    w.writerow(["id", "code", "title", "description", "credits", "updated_at"])
-    for c in qs.iterator():
-        w.writerow([c.id, c.code, c.title, (c.description or "").replace("\n"," "), str(c.credits), c.updated_at.isoformat()])
-
-    data = buf.getvalue().encode("utf-8-sig")  # 带 BOM, 方便 Excel
     ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-    key = f"exports/courses_{ts}.csv"
+    kind = "courses_delta" if watermark else "courses"
+    key = f"exports/{kind}_{ts}{ext}"
+
+    count = 0
+    try:
+        with open_stream(key, content_type=content_type) as out:
+            writer = make_writer(fmt, out, EXPORT_HEADER)
+            for batch in _chunks(rows.iterator(chunk_size=EXPORT_CHUNK_ROWS), EXPORT_CHUNK_ROWS):
+                writer.write_rows(batch)
+                count += len(batch)
+                report(self, {"count": count})
+                latest = max(r[-1] for r in batch)
+                if watermark is None or latest > watermark:
+                    watermark = latest
+            writer.close()
+    except Exception:
+        if cache_key:
+            ExportCacheEntry.objects.filter(key=cache_key).delete()
+        raise
+
+    safe = scan_start - timedelta(seconds=settings.EXPORT_WATERMARK_LAG)
+    if watermark and watermark > safe:
+        # 不回退到 since 之前：since 本身已按同样规则留过余量
+        since_dt = parse_datetime(since) if since else None
+        watermark = max(safe, since_dt) if since_dt else safe
 
-    download_url = save_bytes(key, data)
-    return {"status": "success", "download_url": download_url, "count": qs.count()}
+    if cache_key:
+        ExportCacheEntry.objects.filter(key=cache_key).update(path=out.name, download_url=out.url, count=count)
+
+    if watermark_user_id and watermark:
+        ExportWatermark.objects.update_or_create(
+            user_id=watermark_user_id, scope=ExportWatermark.scope_for(filters),
+            defaults={"watermark": watermark},
+        )
+    return {"status": "success", "download_url": out.url, "count": count, "format": fmt,
+            "since": since, "watermark": watermark.isoformat() if watermark else None}
+
+
+@shared_task
+def purge_export_cache():
+    """定时任务：清理过期的导出缓存条目及其存储对象。"""
+    return {"evicted": purge_expired()}
 
 
 @shared_task(bind=True, autoretry_for=(Exception,), retry_backoff=3, max_retries=3)
 def import_courses_task(self, storage_path: str):
     """
     从 storage 路径或 URL 读取 CSV 导入课程。格式：id,code,title,description,credits
-    - id 可留空（新建），带 id 则尝试更新。
-    返回 {"status":"success","ok":N,"fail":M}
+    - 以 code 为自然键 upsert：按批去重后一条 INSERT ... ON CONFLICT (code) DO UPDATE
+    返回 {"status":"success","ok":N,"fail":M,"errors":[{"line","code","error"}, ...]}
     """
-    raw = read_bytes(storage_path)
-    text = raw.decode("utf-8-sig")
-    reader = csv.DictReader(io.StringIO(text))
-    ok, fail = 0, 0
+    # 流式逐行读取，内存与文件大小无关
+    reader = csv.DictReader(iter_lines(storage_path))
+
+    # 进度上报：每批落库后一次
+    importer = CourseImporter(on_batch=lambda imp: report(self, {"ok": imp.ok, "fail": imp.fail}))
     for i, row in enumerate(reader, start=2):  # 从第2行开始（第1行为表头）
-        try:
-            code = (row.get("code") or "").strip()
-            title = (row.get("title") or "").strip()
-            if not code or not title:
-                fail += 1
-                continue
-            description = (row.get("description") or "").strip()
-            credits_str = (row.get("credits") or "3.0").strip()
-            try:
-                # DecimalField 用字符串最稳
-                credits = str(float(credits_str))
-            except:
-                credits = "3.0"
-
-            # 幂等策略：以 code 为自然键 upsert
-            with transaction.atomic():
-                obj, created = Course.objects.get_or_create(code=code, defaults={
-                    "title": title, "description": description, "credits": credits
-                })
-                if not created:
-                    obj.title = title
-                    obj.description = description
-                    obj.credits = credits
-                    obj.save(update_fields=["title","description","credits"])
-            ok += 1
-
-            # 进度上报（可选）
-            if (ok + fail) % 100 == 0:
-                self.update_state(state="PROGRESS", meta={"ok": ok, "fail": fail})
-
-        except Exception:
-            fail += 1
-            # 可收集错误详情，MVP先略
-
-    return {"status":"success","ok": ok, "fail": fail}
+        importer.feed(i, row)
+    return importer.result()
+
+
+MAX_IMPORT_SHARDS = 16
+# 切分时每个分片文件各开一个存储流，都按最小分片缓冲：峰值内存 ~ shards × (5 MiB + 64 KiB)，16 片约 80 MB
+SHARD_CHUNK_SIZE = S3_MIN_PART
+SHARD_FLUSH_BYTES = 64 * 1024   # csv 编码缓冲，攒够再写入存储流
+
+
+def partition_csv(storage_path: str, shards: int, prefix: str) -> list[str]:
+    """
+    一遍流式读入 CSV（csv 模块按记录解析，带引号的多行字段不会被切开），按 crc32(code) 分到 shards 个文件：
+    同一 code 的所有行落在同一个分片且保持原顺序，“最后一行为准”与单任务导入一致。
+    每条记录前加一列 __line（原文件中的行号，口径同 import_courses_task），错误明细直接给原行号。
+    返回分片文件的存储路径。
+    """
+    reader = csv.reader(iter_lines(storage_path))
+    header = next(reader, None) or []
+    code_at = header.index("code") if "code" in header else None
+    outs, bufs = [], []
+    try:
+        for n in range(shards):
+            outs.append(open_stream(f"{prefix}/{n}.csv", content_type="text/csv", chunk_size=SHARD_CHUNK_SIZE))
+            bufs.append(io.StringIO())
+        writers = [csv.writer(b) for b in bufs]
+        for w in writers:
+            w.writerow(["__line", *header])
+        for line, rec in enumerate(reader, start=2):
+            code = rec[code_at].strip() if code_at is not None and code_at < len(rec) else ""
+            n = zlib.crc32(code.encode()) % shards
+            writers[n].writerow([line, *rec])
+            if bufs[n].tell() >= SHARD_FLUSH_BYTES:
+                outs[n].write(bufs[n].getvalue().encode("utf-8"))
+                bufs[n].seek(0); bufs[n].truncate()
+        for out, buf in zip(outs, bufs):
+            out.write(buf.getvalue().encode("utf-8"))
+            out.close()
+    except Exception:
+        for out in outs:
+            out.abort()
+        raise
+    return [out.name for out in outs]
+
+
+@shared_task(bind=True, autoretry_for=(Exception,), retry_backoff=3, max_retries=3)
+def import_courses_sharded_task(self, storage_path: str, shards: int = 4):
+    """
+    大文件并行导入：先按 code 把 CSV 分成 shards 个文件（partition_csv），每个分片一个子任务（group），
+    全部完成后由 merge_import_results 汇总并删除分片文件（chord）。
+    本任务会被 chord 替换（self.replace），汇总结果仍落在本任务 id 上，
+    TaskStatusAPI 可直接查询；运行期间 PROGRESS.meta.shards 记录各子任务 id，用于合并进度。
+    """
+    shards = min(max(1, shards), MAX_IMPORT_SHARDS)
+    paths = partition_csv(storage_path, shards, f"imports/shards/{self.request.id or uuid4()}")
+    subtasks = [
+        import_courses_shard_task.s(path, n).set(task_id=str(uuid4()))
+        for n, path in enumerate(paths)
+    ]
+    report(self, {"ok": 0, "fail": 0, "shards": [s.options["task_id"] for s in subtasks]})
+    return self.replace(chord(group(subtasks), merge_import_results.s()))
+
+
+@shared_task(bind=True, autoretry_for=(Exception,), retry_backoff=3, max_retries=3)
+def import_courses_shard_task(self, shard_path: str, shard: int):
+    """导入 partition_csv 写出的一个分片。错误明细里的 line 是原文件中的行号。"""
+    importer = CourseImporter(on_batch=lambda imp: report(self, {"ok": imp.ok, "fail": imp.fail}))
+    for row in csv.DictReader(iter_lines(shard_path)):
+        importer.feed(int(row.pop("__line")), row)
+    res = importer.result()
+    for e in res["errors"]:
+        e["shard"] = shard
+    res["path"] = shard_path
+    return res
+
 
+@shared_task
+def merge_import_results(results: list):
+    """chord 回调：合并各分片的 ok/fail/errors（错误按原文件行号排序），并删除分片文件。"""
+    for r in results:
+        if r.get("path"):
+            default_storage.delete(r["path"])
+    ok = sum(r.get("ok", 0) for r in results)
+    fail = sum(r.get("fail", 0) for r in results)
+    errors = sorted((e for r in results for e in r.get("errors", [])), key=lambda e: e["line"])[:MAX_ERRORS]
+    return {"status": "success", "ok": ok, "fail": fail, "errors": errors, "shards": len(results)}
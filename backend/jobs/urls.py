@@ -1,8 +1,13 @@
 from django.urls import path
-from .views import ExportCoursesAPI, ImportCoursesAPI, TaskStatusAPI
+from .views import (
+    ExportCoursesAPI, ImportCoursesAPI, JobListAPI, TaskBatchStatusAPI, TaskStatusAPI, task_events,
+)
 
 urlpatterns = [
     path("exports/courses", ExportCoursesAPI.as_view()),
     path("imports/courses", ImportCoursesAPI.as_view()),
+    path("jobs", JobListAPI.as_view()),
+    path("tasks", TaskBatchStatusAPI.as_view()),
+    path("tasks/events", task_events),
     path("tasks/<str:task_id>", TaskStatusAPI.as_view()),
 ]
\ No newline at end of file
@@ -1,23 +1,217 @@
-from django.core.files.base import ContentFile
+import io
+import os
+
+import urllib3
+
 from django.core.files.storage import default_storage
 
-def save_bytes(path: str, data: bytes) -> str:
+# 流式写入的分片大小：S3 multipart 要求除最后一片外每片 >= 5MB
+CHUNK_SIZE = 8 * 1024 * 1024
+S3_MIN_PART = 5 * 1024 * 1024   # S3 multipart 除最后一片外每片至少 5 MiB，chunk_size 不能比它小
+
+
+def _is_s3(storage) -> bool:
+    # django-storages 的 S3Storage 暴露 bucket_name / connection；本地存储没有
+    return hasattr(storage, "bucket_name") and hasattr(storage, "connection")
+
+
+class _LocalSink:
+    """本地 FileSystemStorage：直接按块追加写文件，失败时删除半成品。"""
+
+    def __init__(self, storage, name: str, content_type: str | None):
+        self.storage = storage
+        self.name = storage.get_available_name(name)
+        full = storage.path(self.name)
+        os.makedirs(os.path.dirname(full), exist_ok=True)
+        self._f = open(full, "xb")
+
+    def put(self, data: bytes):
+        self._f.write(data)
+
+    def commit(self):
+        self._f.close()
+
+    def abort(self):
+        self._f.close()
+        try:
+            os.remove(self.storage.path(self.name))
+        except OSError:
+            pass
+
+
+class _S3MultipartSink:
+    """S3/MinIO：每个分片一次 upload_part，结束时 complete，异常时 abort。"""
+
+    def __init__(self, storage, name: str, content_type: str | None):
+        from storages.utils import clean_name
+
+        self.storage = storage
+        self.name = storage.get_available_name(name)
+        self.key = storage._normalize_name(clean_name(self.name))
+        self.client = storage.connection.meta.client
+        self.bucket = storage.bucket_name
+        self.extra = storage._get_write_parameters(self.key)
+        if content_type:
+            self.extra["ContentType"] = content_type
+        self.upload_id = None
+        self.parts = []
+
+    def put(self, data: bytes):
+        if self.upload_id is None:
+            resp = self.client.create_multipart_upload(Bucket=self.bucket, Key=self.key, **self.extra)
+            self.upload_id = resp["UploadId"]
+        n = len(self.parts) + 1
+        resp = self.client.upload_part(
+            Bucket=self.bucket, Key=self.key, UploadId=self.upload_id, PartNumber=n, Body=data
+        )
+        self.parts.append({"ETag": resp["ETag"], "PartNumber": n})
+
+    def commit(self):
+        if self.upload_id is None:
+            # 一个分片都没有（空文件）：普通 put 即可
+            self.client.put_object(Bucket=self.bucket, Key=self.key, Body=b"", **self.extra)
+            return
+        self.client.complete_multipart_upload(
+            Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+            MultipartUpload={"Parts": self.parts},
+        )
+
+    def abort(self):
+        if self.upload_id is not None:
+            self.client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+
+
+class StorageWriter(io.RawIOBase):
     """
-    把 bytes 保存到默认存储（本地/MinIO 皆可），返回可访问的 URL
+    面向默认存储的只写二进制流：
+    - 写入先进内存缓冲，攒满 CHUNK_SIZE 才下发一个分片，峰值内存 ~ 一个分片
+    - S3/MinIO 走 multipart upload；本地存储按块写文件
+    用法：
+        with open_stream("exports/x.csv", "text/csv") as out:
+            out.write(b"...")
+        out.url  # 关闭后可取下载地址
+    with 块内抛异常时会 abort（不留半成品）。
     """
-    # 确保不会覆盖
-    final_path = default_storage.save(path, ContentFile(data))
-    return default_storage.url(final_path)
 
-def read_bytes(path_or_url: str) -> bytes:
+    def __init__(self, path: str, content_type: str | None = None, chunk_size: int = CHUNK_SIZE):
+        super().__init__()
+        sink_cls = _S3MultipartSink if _is_s3(default_storage) else _LocalSink
+        self._sink = sink_cls(default_storage, path, content_type)
+        self._buf = bytearray()
+        self.chunk_size = chunk_size
+        self.bytes_written = 0
+        self.url = None
+
+    @property
+    def name(self) -> str:
+        return self._sink.name
+
+    def writable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        # 只追加写：位置即已写字节数（zipfile / pyarrow 会调用）
+        return self.bytes_written
+
+    def write(self, b) -> int:
+        self._buf += b
+        n = len(b)
+        self.bytes_written += n
+        if len(self._buf) >= self.chunk_size:
+            self._sink.put(bytes(self._buf))
+            self._buf.clear()
+        return n
+
+    def close(self):
+        if self.closed:
+            return
+        if self._buf:
+            self._sink.put(bytes(self._buf))
+            self._buf.clear()
+        self._sink.commit()
+        self.url = default_storage.url(self.name)
+        super().close()
+
+    def abort(self):
+        if self.closed:
+            return
+        self._buf.clear()
+        self._sink.abort()
+        super().close()
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.abort()
+        else:
+            self.close()
+
+
+def open_stream(path: str, content_type: str | None = None, chunk_size: int = CHUNK_SIZE) -> StorageWriter:
+    return StorageWriter(path, content_type, chunk_size)
+
+
+class _RawReader(io.RawIOBase):
+    """把任意带 read(n) 的对象（本地文件、S3 StreamingBody、urllib3 响应）包装成标准 raw 流。"""
+
+    def __init__(self, f):
+        super().__init__()
+        self._f = f
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        data = self._f.read(len(b))
+        n = len(data)
+        b[:n] = data
+        return n
+
+    def close(self):
+        if not self.closed:
+            self._f.close()
+        super().close()
+
+
+def _is_url(path_or_url: str) -> bool:
+    return path_or_url.startswith("http://") or path_or_url.startswith("https://")
+
+
+_http = urllib3.PoolManager(timeout=urllib3.Timeout(connect=10, read=30), retries=urllib3.Retry(3))
+
+
+def _http_get(url: str) -> urllib3.HTTPResponse:
+    """GET url；响应体不预读，按需 read(n)（自动解 gzip 等 Content-Encoding）。"""
+    resp = _http.request("GET", url, preload_content=False, decode_content=True)
+    if resp.status >= 400:
+        resp.release_conn()
+        raise OSError(f"GET {url} failed: HTTP {resp.status}")
+    return resp
+
+
+def open_binary(path_or_url: str, buffer_size: int = 1024 * 1024) -> io.BufferedReader:
+    """
+    以流的方式打开存储路径或 http(s) URL，内存占用只有一个缓冲区：
+    - URL：urllib3 不预读响应体，边下载边读（自动解 gzip 等 Content-Encoding）
+    - S3/MinIO：GetObject 的响应体直接流式读取（不落临时文件）
+    - 其他存储：default_storage.open
+    """
+    if _is_url(path_or_url):
+        return io.BufferedReader(_RawReader(_http_get(path_or_url)), buffer_size)
+    if _is_s3(default_storage):
+        from storages.utils import clean_name
+
+        key = default_storage._normalize_name(clean_name(path_or_url))
+        body = default_storage.connection.meta.client.get_object(
+            Bucket=default_storage.bucket_name, Key=key
+        )["Body"]
+        return io.BufferedReader(_RawReader(body), buffer_size)
+    return io.BufferedReader(_RawReader(default_storage.open(path_or_url, "rb")), buffer_size)
+
+
+def iter_lines(path_or_url: str, encoding: str = "utf-8-sig"):
     """
-    简化：若是以 / 开头的存储路径，走 storage；若是 http(s) 则发起 GET
+    逐行产出解码后的文本（保留行尾，newline="" 语义），可直接交给 csv.reader / csv.DictReader，
+    字段内含换行的带引号记录也能正确解析。默认 utf-8-sig：有 BOM 去掉，没有也能读。
     """
-    if path_or_url.startswith("http://") or path_or_url.startswith("https://"):
-        import requests
-        resp = requests.get(path_or_url, timeout=30)
-        resp.raise_for_status()
-        return resp.content
-    # 假设是相对存储路径（例如导入 API 预先写到 storage 路径）
-    with default_storage.open(path_or_url, "rb") as f:
-        return f.read()
\ No newline at end of file
+    with io.TextIOWrapper(open_binary(path_or_url), encoding=encoding, newline="") as text:
+        yield from text
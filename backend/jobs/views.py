@@ -1,20 +1,81 @@
 from rest_framework.views import APIView
+from rest_framework import generics
+from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework import status, parsers
 from celery.result import AsyncResult
+import json
+import time
+from uuid import uuid4
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
 from django.core.files.storage import default_storage
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .export_cache import cache_key, normalize_filters, reserve
+from .models import ExportWatermark, Job
+from .registry import dispatch
+from .serializers import JobSerializer
+from core import sse
+from .progress import TERMINAL_STATES, channel, get_async_redis
+from .writers import DEFAULT_FORMAT, EXPORT_FORMATS
+from .tasks import MAX_IMPORT_SHARDS, export_courses_task, import_courses_task, import_courses_sharded_task
 
-from .tasks import export_courses_task, import_courses_task
 
 class ExportCoursesAPI(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request):
-        # 可从 body 里拿筛选条件
-        filters = request.data if isinstance(request.data, dict) else {}
-        task = export_courses_task.delay(filters)
-        return Response({"task_id": task.id}, status=status.HTTP_202_ACCEPTED)
+        # 可从 body 里拿筛选条件；format 指定导出格式（默认 csv）
+        data = request.data
+        filters = data.dict() if hasattr(data, "dict") else (dict(data) if isinstance(data, dict) else {})
+        fmt = filters.pop("format", None) or DEFAULT_FORMAT
+        if fmt not in EXPORT_FORMATS:
+            return Response({"detail": f"format 仅支持: {', '.join(EXPORT_FORMATS)}"}, status=400)
+
+        # 增量导出：since 显式给出水位线；incremental=true 则沿用本人上次成功导出的水位线
+        since = filters.pop("since", None) or None
+        incremental = str(filters.pop("incremental", "")).lower() in ("1", "true", "yes")
+        filters = normalize_filters(filters)
+        if since:
+            dt = parse_datetime(str(since))
+            if dt is None:
+                return Response({"detail": "since 需为 ISO 8601 时间"}, status=400)
+            if timezone.is_naive(dt):
+                dt = timezone.make_aware(dt)
+            since = dt.isoformat()
+        elif incremental:
+            wm = ExportWatermark.objects.filter(user=request.user, scope=ExportWatermark.scope_for(filters)).first()
+            since = wm.watermark.isoformat() if wm else None
+
+        params = {"filters": filters, "format": fmt, "since": since, "incremental": incremental}
+        if incremental:
+            # 水位线因人而异，且需在成功后回写，不走结果缓存
+            job = dispatch(export_courses_task, (filters, fmt), {"since": since, "watermark_user_id": request.user.id},
+                           kind=Job.KIND_EXPORT, user=request.user, params=params)
+            return Response({"task_id": job.task_id}, status=status.HTTP_202_ACCEPTED)
+
+        # 结果缓存：相同筛选 + 目录未变 -> 复用已有文件或正在执行的任务
+        key = cache_key(filters, fmt, since)
+        entry, created = reserve(key, str(uuid4()))
+        if created:
+            try:
+                dispatch(export_courses_task, (filters, fmt), {"since": since, "cache_key": key},
+                         kind=Job.KIND_EXPORT, user=request.user, params=params, task_id=entry.task_id)
+            except Exception:
+                entry.delete()  # 投递失败不能把 key 一直占着
+                raise
+            return Response({"task_id": entry.task_id}, status=status.HTTP_202_ACCEPTED)
+
+        payload = {"task_id": entry.task_id, "cached": True}
+        if entry.path:
+            # 已有现成文件：直接给结果，客户端无需再轮询
+            url = entry.download_url
+            payload["result"] = {"status": "success", "count": entry.count, "format": fmt,
+                                 "download_url": request.build_absolute_uri(url) if url.startswith("/") else url}
+        return Response(payload, status=status.HTTP_202_ACCEPTED)
 
 
 class ImportCoursesAPI(APIView):
@@ -23,11 +84,20 @@ class ImportCoursesAPI(APIView):
     支持两种方式：
     1) multipart 上传字段 file
     2) 直接传 {"file_url": "..."}（可访问的 URL）
+    可选 shards=N（1<N≤MAX_IMPORT_SHARDS）：先按 crc32(code) 把 CSV 记录分到 N 个分片文件（partition_csv，
+    按 CSV 记录解析，带引号的多行字段不会被切开；同一 code 落在同一分片），再并行导入。上传文件与 URL 都适用。
     """
     permission_classes = [IsAuthenticated]
     parser_classes = [parsers.MultiPartParser, parsers.FormParser, parsers.JSONParser]
 
     def post(self, request):
+        try:
+            shards = int(request.data.get("shards") or 1)
+        except (TypeError, ValueError):
+            return Response({"detail":"shards 必须是整数"}, status=400)
+        if shards < 1 or shards > MAX_IMPORT_SHARDS:
+            return Response({"detail":f"shards 取值范围 1~{MAX_IMPORT_SHARDS}"}, status=400)
+
         file_url = request.data.get("file_url")
         storage_path = None
 
@@ -42,35 +112,214 @@ class ImportCoursesAPI(APIView):
             # 保存后 default_storage.save 返回相对路径，传给任务
             storage_path = default_storage.save(f"imports/courses/{f.name}", f)
 
-        task = import_courses_task.delay(storage_path)
-        return Response({"task_id": task.id}, status=status.HTTP_202_ACCEPTED)
+        params = {"source": storage_path, "shards": shards}
+        if shards > 1:
+            job = dispatch(import_courses_sharded_task, (storage_path, shards),
+                           kind=Job.KIND_IMPORT, user=request.user, params=params)
+        else:
+            job = dispatch(import_courses_task, (storage_path,), kind=Job.KIND_IMPORT, user=request.user, params=params)
+        return Response({"task_id": job.task_id}, status=status.HTTP_202_ACCEPTED)
+
+
+def task_payload(task_id: str, absolutize=lambda u: u) -> dict:
+    """单个任务的状态快照：{"state", "meta"|"result"|"error"}。"""
+    r = AsyncResult(task_id)
+    payload = {"state": r.state}
+
+    if r.state == "PROGRESS":
+        meta = r.info or {}
+        if isinstance(meta, dict) and "shards" in meta:
+            meta = merge_shard_progress(meta["shards"])
+        # 进度里如果将来含有链接，也可处理
+        if isinstance(meta, dict) and "download_url" in meta:
+            meta["download_url"] = absolutize(meta["download_url"])
+        payload["meta"] = meta
+
+    elif r.state == "SUCCESS":
+        res = r.result or {}
+        if isinstance(res, dict) and "download_url" in res:
+            res["download_url"] = absolutize(res["download_url"])
+        payload["result"] = res
+
+    elif r.state == "FAILURE":
+        payload["error"] = str(r.info)
+
+    return payload
+
+
+def _absolutizer(request):
+    def absolutize(url: str) -> str:
+        # /media/... -> http://127.0.0.1:8000/media/...
+        return request.build_absolute_uri(url) if url and url.startswith("/") else url
+    return absolutize
+
+
+JOB_ADMIN_ROLES = ("manager", "registrar")   # 可看所有人的任务
+HIDDEN_PAYLOAD = {"state": "PENDING"}         # 别人的任务按未知 id 处理，不暴露是否存在
+
+
+def foreign_task_ids(user, ids) -> set:
+    """ids 中登记在别人名下的任务（Job 表）；manager/registrar 可看全部。没有登记的任务不在此列。"""
+    if getattr(user, "role", None) in JOB_ADMIN_ROLES:
+        return set()
+    return set(Job.objects.filter(task_id__in=ids).exclude(user=user).values_list("task_id", flat=True))
 
 
 class TaskStatusAPI(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request, task_id: str):
-        r = AsyncResult(task_id)
-        payload = {"state": r.state}
-
-        def absolutize(url: str) -> str:
-            # /media/... -> http://127.0.0.1:8000/media/...
-            return request.build_absolute_uri(url) if url and url.startswith("/") else url
-
-        if r.state == "PROGRESS":
-            meta = r.info or {}
-            # 进度里如果将来含有链接，也可处理
-            if isinstance(meta, dict) and "download_url" in meta:
-                meta["download_url"] = absolutize(meta["download_url"])
-            payload["meta"] = meta
-
-        elif r.state == "SUCCESS":
-            res = r.result or {}
+        if foreign_task_ids(request.user, [task_id]):
+            return Response(HIDDEN_PAYLOAD)
+        return Response(task_payload(task_id, _absolutizer(request)))
+
+
+def _shard_totals(states: dict) -> dict:
+    """states: {shard_id: (state, info)} -> 合并后的整体进度"""
+    ok = fail = done = 0
+    for state, info in states.values():
+        if state in ("SUCCESS", "FAILURE"):
+            done += 1
+        if isinstance(info, dict):
+            ok += info.get("ok", 0)
+            fail += info.get("fail", 0)
+    return {"ok": ok, "fail": fail, "shards_done": done, "shards_total": len(states),
+            "shards": list(states)}
+
+
+def _shard_snapshot(shard_ids: list) -> dict:
+    states = {}
+    for sid in shard_ids:
+        sr = AsyncResult(sid)
+        states[sid] = (sr.state, sr.result if sr.state == "SUCCESS" else sr.info)
+    return states
+
+
+def merge_shard_progress(shard_ids: list) -> dict:
+    """分片导入运行中：把各子任务的进度/结果相加，得到整体进度。"""
+    return _shard_totals(_shard_snapshot(shard_ids))
+
+
+MAX_EVENT_TASKS = 50
+STREAM_MAX_SECONDS = 300
+HEARTBEAT_SECONDS = 15
+
+
+async def task_events(request):
+    """
+    GET /api/tasks/events?ids=<id1>,<id2>[&token=<access>]  —— Server-Sent Events
+    先推送每个任务的当前快照，然后订阅 Redis 频道 task-progress:<id>（worker 由 progress.report 推送），
+    把状态/进度变化实时推给客户端；所有任务结束或超过 STREAM_MAX_SECONDS 后断开（客户端按 retry 重连）。
+    每个连接只占用一个 redis.asyncio 订阅，等待期间不占线程，不再反复查询结果后端。
+    分片导入会同时订阅各分片频道，推送合并后的整体进度。需以 ASGI 运行（见 core/sse.py）。
+    别人登记的任务只推一条 PENDING、不订阅（可见范围同 TaskBatchStatusAPI）。
+    """
+    user = await sse.authenticate(request)
+    if user is None:
+        return sse.unauthorized()
+    ids = [t for t in (request.GET.get("ids") or "").split(",") if t.strip()]
+    ids = list(dict.fromkeys(t.strip() for t in ids))
+    if not ids or len(ids) > MAX_EVENT_TASKS:
+        return JsonResponse({"detail": f"ids 需为 1~{MAX_EVENT_TASKS} 个任务 id，逗号分隔"}, status=400)
+    hidden = await sync_to_async(foreign_task_ids)(user, ids)
+    return sse.stream(_task_events(ids, _absolutizer(request), hidden))
+
+
+async def _task_events(ids, absolutize, hidden=frozenset()):
+    client = get_async_redis()
+    pubsub = client.pubsub(ignore_subscribe_messages=True)
+    snapshot = sync_to_async(task_payload, thread_sensitive=False)
+    try:
+        # 先订阅再取快照，避免两者之间的更新丢失
+        await pubsub.subscribe(*[channel(t) for t in ids if t not in hidden])
+        yield "retry: 3000\n\n"
+        open_ids = set()
+        shard_parent, shard_states = {}, {}
+        for tid in ids:
+            if tid in hidden:
+                yield sse.message({"id": tid, **HIDDEN_PAYLOAD})
+                continue
+            snap = await snapshot(tid, absolutize)
+            meta = snap.get("meta")
+            if isinstance(meta, dict) and meta.get("shards"):
+                shard_states[tid] = await sync_to_async(_shard_snapshot, thread_sensitive=False)(meta["shards"])
+                shard_parent.update({sid: tid for sid in meta["shards"]})
+                await pubsub.subscribe(*[channel(sid) for sid in meta["shards"]])
+            if snap["state"] not in TERMINAL_STATES:
+                open_ids.add(tid)
+            yield sse.message({"id": tid, **snap})
+
+        deadline = time.monotonic() + STREAM_MAX_SECONDS
+        while open_ids and (left := deadline - time.monotonic()) > 0:
+            msg = await pubsub.get_message(timeout=min(HEARTBEAT_SECONDS, left))
+            if msg is None:
+                yield ": keepalive\n\n"
+                continue
+            data = json.loads(msg["data"])
+            tid = data.get("id")
+            if tid in shard_parent:
+                parent = shard_parent[tid]
+                info = data.get("result") if data.get("state") == "SUCCESS" else data.get("meta")
+                shard_states[parent][tid] = (data.get("state"), info)
+                yield sse.message({"id": parent, "state": "PROGRESS", "meta": _shard_totals(shard_states[parent])})
+                continue
+            res = data.get("result")
             if isinstance(res, dict) and "download_url" in res:
                 res["download_url"] = absolutize(res["download_url"])
-            payload["result"] = res
+            if data.get("state") in TERMINAL_STATES:
+                open_ids.discard(tid)
+            yield sse.message(data)
+    finally:
+        await pubsub.aclose()
+        await client.aclose()
+
 
-        elif r.state == "FAILURE":
-            payload["error"] = str(r.info)
+class JobPagination(PageNumberPagination):
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 200
+
+
+class JobListAPI(generics.ListAPIView):
+    """
+    GET /api/jobs?kind=import|export&status=...&page=N
+    manager/registrar 可看全部任务，其余用户只看自己发起的。
+    """
+    permission_classes = [IsAuthenticated]
+    serializer_class = JobSerializer
+    pagination_class = JobPagination
+
+    def get_queryset(self):
+        qs = Job.objects.select_related("user")
+        if getattr(self.request.user, "role", None) not in JOB_ADMIN_ROLES:
+            qs = qs.filter(user=self.request.user)
+        kind = self.request.query_params.get("kind")
+        if kind:
+            qs = qs.filter(kind=kind)
+        st = self.request.query_params.get("status")
+        if st:
+            qs = qs.filter(status=st)
+        return qs
+
+
+class TaskBatchStatusAPI(APIView):
+    """
+    GET /api/tasks?ids=<id1>,<id2>,...  一次查询多个任务的状态，返回 {task_id: payload}
+    已结束且有登记的任务直接读 Job 表（不受结果后端过期影响），其余查结果后端。
+    别人登记的任务（manager/registrar 除外）一律返回 PENDING，与 JobListAPI 的可见范围一致。
+    """
+    permission_classes = [IsAuthenticated]
+    MAX_IDS = 100
 
-        return Response(payload)
\ No newline at end of file
+    def get(self, request):
+        ids = list(dict.fromkeys(t.strip() for t in (request.query_params.get("ids") or "").split(",") if t.strip()))
+        if not ids or len(ids) > self.MAX_IDS:
+            return Response({"detail": f"ids 需为 1~{self.MAX_IDS} 个任务 id，逗号分隔"}, status=400)
+        absolutize = _absolutizer(request)
+        out = {tid: dict(HIDDEN_PAYLOAD) for tid in foreign_task_ids(request.user, ids)}
+        done = Job.objects.filter(task_id__in=ids, status__in=("success", "failure")).exclude(task_id__in=out)
+        out.update({job.task_id: job.status_payload(absolutize) for job in done})
+        for tid in ids:
+            if tid not in out:
+                out[tid] = task_payload(tid, absolutize)
+        return Response(out)
@@ -0,0 +1,130 @@
+"""
+课程导出的各格式写出器：都以「行组」为单位流式写入一个二进制流（StorageWriter），
+不在内存里攒整份文件。
+
+行的形状与 EXPORT_HEADER 一致：(id, code, title, description, credits, updated_at)，
+credits 为 Decimal，updated_at 为带时区的 datetime，各格式自行决定如何落盘。
+"""
+import codecs
+import csv
+import io
+
+from django.utils import timezone
+
+# format -> (扩展名, Content-Type)
+EXPORT_FORMATS = {
+    "csv": (".csv", "text/csv"),
+    "csv.gz": (".csv.gz", "application/gzip"),
+    "csv.zst": (".csv.zst", "application/zstd"),
+    "parquet": (".parquet", "application/vnd.apache.parquet"),
+    "xlsx": (".xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+}
+DEFAULT_FORMAT = "csv"
+
+XLSX_MAX_ROWS = 1048576  # Excel 单表行数上限（含表头）
+
+
+class CsvRowWriter:
+    """UTF-8 带 BOM（方便 Excel）；compress 为 gz/zst 时外面再套一层流式压缩。"""
+
+    def __init__(self, out, header, compress: str | None = None):
+        self._wrapper = None
+        if compress == "gz":
+            import gzip
+            self._wrapper = gzip.GzipFile(fileobj=out, mode="wb")
+        elif compress == "zst":
+            import zstandard
+            self._wrapper = zstandard.ZstdCompressor().stream_writer(out, closefd=False)
+        self._out = self._wrapper or out
+        self._buf = io.StringIO()
+        self._csv = csv.writer(self._buf)
+        self._out.write(codecs.BOM_UTF8)
+        self._csv.writerow(header)
+
+    def write_rows(self, rows):
+        for cid, code, title, description, credits, updated_at in rows:
+            self._csv.writerow([cid, code, title, (description or "").replace("\n", " "),
+                                str(credits), updated_at.isoformat()])
+        self._flush()
+
+    def close(self):
+        self._flush()
+        # 压缩层 close 才会写出尾部；gzip/zstd 都不会关闭底层存储流
+        if self._wrapper is not None:
+            self._wrapper.close()
+
+    def _flush(self):
+        if self._buf.tell():
+            self._out.write(self._buf.getvalue().encode("utf-8"))
+            self._buf.seek(0); self._buf.truncate()
+
+
+class ParquetRowWriter:
+    """每批一个 row group。"""
+
+    def __init__(self, out, header):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa = pa
+        self._schema = pa.schema([
+            ("id", pa.int64()),
+            ("code", pa.string()),
+            ("title", pa.string()),
+            ("description", pa.string()),
+            ("credits", pa.decimal128(3, 1)),
+            ("updated_at", pa.timestamp("us", tz="UTC")),
+        ])
+        assert self._schema.names == list(header)
+        self._writer = pq.ParquetWriter(out, self._schema, compression="zstd")
+
+    def write_rows(self, rows):
+        if not rows:
+            return
+        cols = list(zip(*rows))
+        self._writer.write_table(self._pa.Table.from_arrays(
+            [self._pa.array(c, type=f.type) for c, f in zip(cols, self._schema)],
+            schema=self._schema,
+        ))
+
+    def close(self):
+        self._writer.close()
+
+
+class XlsxRowWriter:
+    """openpyxl write-only 模式：行随写随刷到临时文件，close 时打包写出。"""
+
+    def __init__(self, out, header):
+        from openpyxl import Workbook
+
+        self._out = out
+        self._wb = Workbook(write_only=True)
+        self._ws = self._wb.create_sheet("courses")
+        self._ws.append(list(header))
+        self._rows = 1
+
+    def write_rows(self, rows):
+        self._rows += len(rows)
+        if self._rows > XLSX_MAX_ROWS:
+            raise ValueError(f"xlsx 最多 {XLSX_MAX_ROWS - 1} 行，请改用 csv/parquet")
+        for cid, code, title, description, credits, updated_at in rows:
+            # Excel 不支持带时区的时间，按本地时区写成 naive
+            self._ws.append([cid, code, title, description, credits,
+                             timezone.localtime(updated_at).replace(tzinfo=None)])
+
+    def close(self):
+        self._wb.save(self._out)
+
+
+def make_writer(fmt: str, out, header):
+    if fmt == "csv":
+        return CsvRowWriter(out, header)
+    if fmt == "csv.gz":
+        return CsvRowWriter(out, header, compress="gz")
+    if fmt == "csv.zst":
+        return CsvRowWriter(out, header, compress="zst")
+    if fmt == "parquet":
+        return ParquetRowWriter(out, header)
+    if fmt == "xlsx":
+        return XlsxRowWriter(out, header)
+    raise ValueError(f"不支持的导出格式: {fmt}")
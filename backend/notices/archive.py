@@ -0,0 +1,56 @@
+"""
+Delivery 冷热分离：把不再变化的投递搬进 DeliveryArchive，热表只留仍可能被标记、计数的行。
+归档条件：
+- 已撤回公告的全部投递（收件箱不再显示，未读数撤回时已扣减）
+- push 公告里已确认、且早于 NOTICES_ARCHIVE_AFTER_DAYS 天的投递
+pull 公告的投递行决定该公告在收件箱里的状态，始终留在热表（只有用户操作过才有行，量很小）。
+按投递 id 键集分批，每批一个事务：INSERT ... SELECT 进归档表、再删热表，行不经过 Python。
+公告统计是物化字段，不受归档影响；reconcile 重算时把归档表一并计入。
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Announcement, Delivery, DeliveryArchive
+
+ARCHIVE_BATCH_SIZE = 5000
+_COLUMNS = ("id", "announcement_id", "user_id", "state", "delivered_at", "ack_at", "created_at")
+
+
+def candidates(now=None):
+    horizon = (now or timezone.now()) - timedelta(days=settings.NOTICES_ARCHIVE_AFTER_DAYS)
+    return Delivery.objects.filter(
+        Q(announcement__status="withdrawn")
+        | Q(announcement__fanout_mode=Announcement.FANOUT_PUSH, state="acknowledged", created_at__lt=horizon)
+    )
+
+
+def _insert_sql(select_sql: str) -> str:
+    qn = connection.ops.quote_name
+    cols = ", ".join(_COLUMNS)
+    return (
+        f"INSERT INTO {qn(DeliveryArchive._meta.db_table)} ({cols}, archived_at) "
+        f"SELECT t.*, %s FROM ({select_sql}) t WHERE true "
+        f"ON CONFLICT (id) DO NOTHING"
+    )
+
+
+def archive(batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+    """把满足条件的投递搬进归档表，返回搬走的行数。中途失败重跑即可：已提交的批次不会重复搬。"""
+    now, moved, last_id = timezone.now(), 0, 0
+    qs = candidates(now)
+    while True:
+        ids = list(qs.filter(id__gt=last_id).order_by("id").values_list("id", flat=True)[:batch_size])
+        if not ids:
+            break
+        last_id = ids[-1]
+        select_sql, params = Delivery.objects.filter(pk__in=ids).order_by().values(*_COLUMNS).query.sql_with_params()
+        with transaction.atomic(), connection.cursor() as cur:
+            cur.execute(_insert_sql(select_sql), [now, *params])
+            moved += Delivery.objects.filter(pk__in=ids).delete()[0]
+        if len(ids) < batch_size:
+            break
+    return moved
@@ -0,0 +1,95 @@
+"""
+物化计数的维护，都是集合操作、与投递行同一事务提交，不逐人读写：
+- 未读数（UnreadCounter）：push 投递 fanout 插入时 +1，确认、撤回时 -1；
+  pull 公告不写计数，读取时按公告表现算（公告数远小于投递数）。
+  UnreadCountAPI 因此只需一次主键查找 + 一次公告表计数。
+- 公告统计（Announcement.total/delivered/ack_count）：fanout 累加 total，状态前进时累加。
+两者都有 reconcile 按投递表重算，纠正漂移；统计重算时把归档表（DeliveryArchive）一并计入。
+"""
+from django.db import connection
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import Announcement, Delivery, DeliveryArchive, UnreadCounter
+
+
+def bump_inserted(cur, announcement_id: int, created_at, lo: int, hi: int):
+    """fanout 一段插入后调用（同一事务）：给这段里刚插入（created_at 相同）的投递用户 +1。"""
+    qn = connection.ops.quote_name
+    c, d = qn(UnreadCounter._meta.db_table), qn(Delivery._meta.db_table)
+    cur.execute(
+        f"INSERT INTO {c} (user_id, unread) "
+        f"SELECT d.user_id, 1 FROM {d} d "
+        f"WHERE d.announcement_id = %s AND d.created_at = %s AND d.user_id >= %s AND d.user_id < %s "
+        f"ON CONFLICT (user_id) DO UPDATE SET unread = {c}.unread + 1",
+        [announcement_id, created_at, lo, hi],
+    )
+
+
+def add_stats(announcement_id: int, total: int = 0, delivered: int = 0, ack: int = 0):
+    Announcement.objects.filter(pk=announcement_id).update(
+        total_count=F("total_count") + total,
+        delivered_count=F("delivered_count") + delivered,
+        ack_count=F("ack_count") + ack,
+    )
+
+
+def add(user_id: int, n: int):
+    UnreadCounter.objects.filter(user_id=user_id).update(unread=F("unread") + n)
+
+
+def on_withdraw(a: Announcement) -> int:
+    """push 公告撤回：还没确认的接收者各 -1。"""
+    if a.fanout_mode != Announcement.FANOUT_PUSH:
+        return 0
+    pending = Delivery.objects.filter(announcement=a).exclude(state="acknowledged").values("user_id")
+    return UnreadCounter.objects.filter(user_id__in=pending).update(unread=F("unread") - 1)
+
+
+def unread_for(user) -> int:
+    from .inbox import pull_audience_q
+
+    pushed = UnreadCounter.objects.filter(user=user).values_list("unread", flat=True).first() or 0
+    acked = Delivery.objects.filter(user=user, state="acknowledged").values("announcement_id")
+    pulled = Announcement.objects.filter(pull_audience_q(user)).exclude(pk__in=acked).count()
+    return pushed + pulled
+
+
+def _actual():
+    return Coalesce(Subquery(
+        Delivery.objects.filter(user_id=OuterRef("user_id"), announcement__status="published",
+                                announcement__fanout_mode=Announcement.FANOUT_PUSH)
+        .exclude(state="acknowledged")
+        .values("user_id").annotate(n=Count("id")).values("n")
+    ), Value(0))
+
+
+def reconcile() -> int:
+    """按投递表重算计数器，返回被校正的用户数。"""
+    missing = (Delivery.objects.exclude(state="acknowledged")
+               .filter(announcement__fanout_mode=Announcement.FANOUT_PUSH, user__unread_counter__isnull=True)
+               .values_list("user_id", flat=True).distinct())
+    UnreadCounter.objects.bulk_create([UnreadCounter(user_id=uid, unread=0) for uid in missing],
+                                      ignore_conflicts=True, batch_size=1000)
+    return UnreadCounter.objects.exclude(unread=_actual()).update(unread=_actual())
+
+
+def _stat(**filters):
+    def count(model):
+        return Coalesce(Subquery(
+            model.objects.filter(announcement_id=OuterRef("pk"), **filters)
+            .values("announcement_id").annotate(n=Count("id")).values("n")
+        ), Value(0))
+    return count(Delivery) + count(DeliveryArchive)
+
+
+def reconcile_stats() -> int:
+    """按投递表 + 归档表重算公告统计（pull 公告的 total 是发布时的受众人数，不重算），返回被校正的公告数。"""
+    delivered, ack = _stat(state__in=["delivered", "acknowledged"]), _stat(state="acknowledged")
+    pull = Announcement.objects.filter(fanout_mode=Announcement.FANOUT_PULL)
+    push = Announcement.objects.filter(fanout_mode=Announcement.FANOUT_PUSH)
+    n = (pull.exclude(delivered_count=delivered, ack_count=ack)
+         .update(delivered_count=delivered, ack_count=ack))
+    n += (push.exclude(total_count=_stat(), delivered_count=delivered, ack_count=ack)
+          .update(total_count=_stat(), delivered_count=delivered, ack_count=ack))
+    return n
@@ -0,0 +1,58 @@
+"""
+公告实时事件的发布端（同步代码里调用，worker / WSGI 均可）：
+- notices:broadcast：新公告、撤回，带受众匹配规则 match，由各连接自行判断是否与自己相关，
+  一条公告只 PUBLISH 一次，不按人展开
+- notices:user:<id>：某个用户自己的状态变化（确认后未读数变了），推给他所有在线连接
+订阅端见 notices/realtime.py（ASGI + redis.asyncio），任一应用节点上的连接都能收到。
+"""
+import json
+import logging
+
+from jobs.progress import get_redis
+from .models import Announcement
+
+logger = logging.getLogger(__name__)
+
+BROADCAST = "notices:broadcast"
+USER_PREFIX = "notices:user:"
+
+
+def user_channel(user_id: int) -> str:
+    return f"{USER_PREFIX}{user_id}"
+
+
+def audience_match(a) -> dict:
+    """公告受众的匹配规则：roles / departments / users 任一命中即相关。"""
+    if a.audience == Announcement.AUD_ALL_STUDENTS:
+        return {"roles": ["student"]}
+    t = a.targets or {}
+    return {"roles": t.get("roles") or [], "departments": t.get("departments") or [], "users": t.get("users") or []}
+
+
+def matches(match: dict | None, user) -> bool:
+    if match is None:
+        return True
+    return (user.role in match.get("roles", ()) or user.department in match.get("departments", ())
+            or user.id in match.get("users", ()))
+
+
+def _publish(channel: str, payload: dict):
+    """推送失败只记日志：实时推送是锦上添花，客户端重连后会拿到最新未读数。"""
+    try:
+        get_redis().publish(channel, json.dumps(payload, default=str, ensure_ascii=False))
+    except Exception:
+        logger.warning("publish notice event failed on %s", channel, exc_info=True)
+
+
+def announce(a, kind: str = "announcement"):
+    """
+    kind: announcement（已投递/已发布）| withdrawn
+    新公告对受众一定是未读，事件带 unread_delta=1；撤回时各人是否已确认不同，只提示客户端按需重取。
+    """
+    payload = {"type": kind, "id": a.id, "title": a.title, "match": audience_match(a)}
+    payload.update({"unread_delta": 1} if kind == "announcement" else {"refetch_unread": True})
+    _publish(BROADCAST, payload)
+
+
+def user_changed(user_id: int):
+    _publish(user_channel(user_id), {"type": "changed"})
@@ -0,0 +1,244 @@
+"""
+收件箱：两路键集归并（inbox_page），每页的代价与公告表、投递表的大小无关，读收件箱不写库。
+- 只显示已发布的公告（撤回后从收件箱消失，未读数同步扣减）
+- 投递行：走 Delivery 的 (user, -created_at, -id) 索引；push 公告 fanout 时已生成
+- pull 公告：发布时不写投递，该用户还没有投递行的走 Announcement 的 (status, -created_at, -id) 索引，
+  以 id 为 null 的 queued 行出现；标记/确认/提醒时才由 materialize_pull 落一行（稀疏的个人状态），
+  created_at 取公告的 created_at，落行前后在收件箱里的位置不变
+归档到 DeliveryArchive 的历史投递不在这里，走 ?archived=1（见 archive.py）；
+?compact=1 只给摘要和发布者 id（compact_queryset / compact_page），发布者另列一张去重的表。
+"""
+import base64
+import json
+from collections import Counter
+from functools import partial
+
+from django.db import connection, transaction
+from django.db.models import DateTimeField, F, Q, Value
+from django.db.models.functions import Length, Substr
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from users.models import User
+from . import counters, events
+from .models import Announcement, Delivery, DeliveryArchive
+
+SUMMARY_LENGTH = 200   # 紧凑收件箱里正文摘要的字数
+INBOX_PAGE_SIZE = 20
+
+def pull_audience_q(user) -> Q:
+    """user 可见的 pull 公告（已发布、受众包含 user、发布不早于其注册时间，与 push 的口径一致）。"""
+    if user.role != "student":
+        return Q(pk__in=[])
+    return Q(fanout_mode=Announcement.FANOUT_PULL, status="published",
+             audience=Announcement.AUD_ALL_STUDENTS, created_at__gte=user.date_joined)
+
+
+def audience_users(a: Announcement):
+    """pull 公告（只有全体学生公告）的受众（统计总数、提醒用）。"""
+    return User.objects.filter(role="student", date_joined__lte=a.created_at)
+
+
+def in_audience(a: Announcement, user) -> bool:
+    return Announcement.objects.filter(pk=a.pk).filter(pull_audience_q(user)).exists()
+
+
+def _insert_pull(select_sql: str, params) -> int:
+    """select_sql 产出 (ann, usr, at) 三列：一条 INSERT ... SELECT 补 queued 投递，已有或已归档的跳过。"""
+    qn = connection.ops.quote_name
+    with connection.cursor() as cur:
+        cur.execute(
+            f"INSERT INTO {qn(Delivery._meta.db_table)} (announcement_id, user_id, state, retry_count, created_at) "
+            f"SELECT t.ann, t.usr, 'queued', 0, t.at FROM ({select_sql}) t "
+            f"WHERE NOT EXISTS (SELECT 1 FROM {qn(DeliveryArchive._meta.db_table)} x "
+            f"WHERE x.announcement_id = t.ann AND x.user_id = t.usr) "
+            f"ON CONFLICT (announcement_id, user_id) DO NOTHING",
+            params,
+        )
+        return max(cur.rowcount, 0)
+
+
+def materialize_pull(user, announcement_ids=None) -> int:
+    """
+    给 user 可见、还没有投递行的 pull 公告补 queued 投递，返回新插入的行数。只在标记时调用，读收件箱不落行。
+    created_at 取公告的 created_at（即收件箱里 pull 行的排序键）。
+    pull 公告不计入 UnreadCounter（见 counters.unread_for），这里不用动计数。
+    """
+    if user.role != "student":
+        return 0
+    src = Announcement.objects.filter(pull_audience_q(user))
+    if announcement_ids is not None:
+        src = src.filter(pk__in=announcement_ids)
+    select_sql, params = (src.order_by().values(ann=F("id"), usr=Value(user.id), at=F("created_at"))
+                          .query.sql_with_params())
+    return _insert_pull(select_sql, params)
+
+
+def materialize_pull_users(a: Announcement, user_ids) -> int:
+    """materialize_pull 的按公告批量版（提醒认领用）：给 user_ids 补 a 的投递行。"""
+    select_sql, params = (User.objects.filter(pk__in=user_ids).order_by()
+                          .values(ann=Value(a.pk), usr=F("id"),
+                                  at=Value(a.created_at, output_field=DateTimeField()))
+                          .query.sql_with_params())
+    return _insert_pull(select_sql, params)
+
+
+def inbox_queryset(user):
+    """user 的投递行（收件箱里有投递的部分）。"""
+    return (Delivery.objects.filter(user=user, announcement__status="published")
+            .select_related("announcement", "announcement__publisher"))
+
+
+def pull_queryset(user):
+    """user 可见、还没有投递行（含已归档）的 pull 公告，收件箱里以 id 为 null 的 queued 行出现。"""
+    mine = Delivery.objects.filter(user=user).values("announcement_id")
+    archived = DeliveryArchive.objects.filter(user=user).values("announcement_id")
+    return Announcement.objects.filter(pull_audience_q(user)).exclude(pk__in=mine).exclude(pk__in=archived)
+
+
+def encode_cursor(key) -> str:
+    t, kind, pk = key
+    return base64.urlsafe_b64encode(json.dumps([t.isoformat(), kind, pk]).encode()).decode()
+
+
+def decode_cursor(value: str | None):
+    """解析 encode_cursor 的结果；没给游标返回 None，格式不对抛 ValueError。"""
+    if not value:
+        return None
+    try:
+        t, kind, pk = json.loads(base64.urlsafe_b64decode(value.encode()))
+        dt = parse_datetime(t)
+    except Exception as e:
+        raise ValueError("invalid cursor") from e
+    if dt is None or kind not in (0, 1) or not isinstance(pk, int):
+        raise ValueError("invalid cursor")
+    return dt, kind, pk
+
+
+def _after(qs, key, kind: int):
+    """
+    排在游标之后的行。整体顺序为 (created_at, kind, id) 倒序：同一时刻投递行（kind=1，id 为投递 id）
+    排在 pull 公告（kind=0，id 为公告 id）之前，两路各自的 id 只在同类里比较。
+    """
+    if key is None:
+        return qs
+    t, at_kind, pk = key
+    q = Q(created_at__lt=t)
+    if kind == at_kind:
+        q |= Q(created_at=t, pk__lt=pk)
+    elif kind < at_kind:
+        q |= Q(created_at=t)
+    return qs.filter(q)
+
+
+def inbox_page(user, after=None, size: int = INBOX_PAGE_SIZE, pending: bool = False, compact: bool = False):
+    """
+    收件箱一页：投递行与 pull 公告两路键集各取 size+1 条，在内存里按 (created_at, kind, id) 归并。
+    compact 时行为 compact_queryset 形状的字典，否则为 Delivery（pull 公告是未保存的实例，id 为 None）。
+    返回 (rows, 下一页的游标 key；没有下一页为 None)。
+    """
+    pushed = inbox_queryset(user)
+    if pending:
+        pushed = pushed.exclude(state="acknowledged")
+    pushed = _after(pushed, after, 1).order_by("-created_at", "-id")
+    pulled = _after(pull_queryset(user), after, 0).order_by("-created_at", "-id")
+    if compact:
+        pulled = pulled.values("created_at", "title", "publisher_id", "publish_at", announcement_id=F("id"),
+                               summary=Substr("body", 1, SUMMARY_LENGTH), body_length=Length("body"))
+        rows = list(compact_queryset(pushed)[:size + 1]) + [
+            {**r, "id": None, "state": "queued", "delivered_at": None, "ack_at": None} for r in pulled[:size + 1]]
+        key = lambda r: (r["created_at"], int(r["id"] is not None), r["id"] or r["announcement_id"])
+    else:
+        rows = list(pushed[:size + 1]) + [Delivery(announcement=a, user=user, created_at=a.created_at)
+                                          for a in pulled.select_related("publisher")[:size + 1]]
+        key = lambda d: (d.created_at, int(d.id is not None), d.id or d.announcement_id)
+    rows.sort(key=key, reverse=True)
+    return rows[:size], (key(rows[size - 1]) if len(rows) > size else None)
+
+
+def compact_queryset(qs):
+    """
+    紧凑收件箱（?compact=1）的投递行：values() 直接出字典，不实例化模型、不 JOIN 发布者；
+    正文在数据库里截成摘要，全文按需取 /api/announcements/<id>/。
+    """
+    return qs.select_related(None).values(
+        "id", "announcement_id", "state", "delivered_at", "ack_at", "created_at",
+        title=F("announcement__title"), publisher_id=F("announcement__publisher_id"),
+        publish_at=F("announcement__publish_at"),
+        summary=Substr("announcement__body", 1, SUMMARY_LENGTH), body_length=Length("announcement__body"),
+    )
+
+
+def compact_page(rows) -> dict:
+    """把一页 compact_queryset 的行整理成 {"results", "publishers"}，发布者用户名去重后单独给出。"""
+    results = [{
+        "id": r["id"], "announcement": r["announcement_id"], "title": r["title"], "summary": r["summary"],
+        "truncated": r["body_length"] > SUMMARY_LENGTH, "publisher": r["publisher_id"],
+        "publish_at": r["publish_at"], "state": r["state"], "delivered_at": r["delivered_at"],
+        "ack_at": r["ack_at"], "created_at": r["created_at"],
+    } for r in rows]
+    pids = {r["publisher"] for r in results}
+    publishers = dict(User.objects.filter(pk__in=pids).values_list("id", "username")) if pids else {}
+    return {"results": results, "publishers": publishers}
+
+
+def mark(a: Announcement, user, state: str) -> bool:
+    """按公告标记；pull 公告此时才落 Delivery 行（materialize_pull）。"""
+    if a.fanout_mode == Announcement.FANOUT_PULL:
+        materialize_pull(user, [a.pk])
+    return bool(apply_state(Delivery.objects.filter(announcement=a, user=user), state))
+
+
+def set_state(d: Delivery, a: Announcement, state: str) -> bool:
+    return bool(apply_state(Delivery.objects.filter(pk=d.pk), state))
+
+
+def bulk_mark(user, state: str, ids=None, announcement_ids=None) -> int:
+    """
+    批量标记 user 的投递：ids（投递 id）、announcement_ids（公告 id），都不给则为全部未处理的。
+    按公告标记时先给还没有投递行的 pull 公告补行。返回实际变化的行数。
+    """
+    qs = Delivery.objects.filter(user=user, announcement__status="published")
+    if ids is not None:
+        qs = qs.filter(pk__in=ids)
+    else:
+        materialize_pull(user, announcement_ids)
+        if announcement_ids is not None:
+            qs = qs.filter(announcement_id__in=announcement_ids)
+    return apply_state(qs, state)
+
+
+def _bump(field: str, deltas: Counter):
+    # 按增量分组，每种增量一条 UPDATE（单用户操作时增量都是 1）
+    by_n = {}
+    for aid, n in deltas.items():
+        by_n.setdefault(n, []).append(aid)
+    for n, aids in by_n.items():
+        Announcement.objects.filter(pk__in=aids).update(**{field: F(field) + n})
+
+
+def apply_state(qs, state: str) -> int:
+    """
+    把 qs 中的投递推进到 delivered / acknowledged（只前进不后退）：一条条件 UPDATE，
+    并在同一事务里累加公告统计、扣减未读数。先锁住要变化的行，并发的重复确认只会生效一次。
+    返回实际变化的行数。
+    """
+    now = timezone.now()
+    src = ["queued"] if state == "delivered" else ["queued", "delivered"]
+    with transaction.atomic():
+        rows = list(qs.filter(state__in=src).select_for_update(of=("self",)).values_list(
+            "id", "announcement_id", "user_id", "state", "announcement__fanout_mode", "announcement__status"))
+        if not rows:
+            return 0
+        stamp = {"delivered_at": now} if state == "delivered" else {"ack_at": now}
+        changed = Delivery.objects.filter(pk__in=[r[0] for r in rows]).update(state=state, **stamp)
+        _bump("delivered_count", Counter(aid for _, aid, _, st, _, _ in rows if st == "queued"))
+        if state == "acknowledged":
+            _bump("ack_count", Counter(aid for _, aid, *_ in rows))
+            unread = Counter(uid for _, _, uid, _, mode, status in rows
+                             if mode == Announcement.FANOUT_PUSH and status == "published")
+            for uid, n in unread.items():
+                counters.add(uid, -n)
+            for uid in {r[2] for r in rows}:
+                transaction.on_commit(partial(events.user_changed, uid))
+    return changed
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.7 on 2026-10-18 14:12
+
+import notices.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notices', '0001_initial'),
+    ]
+
+    operations = [
+        # 已有公告都已按 push 写过投递
+        migrations.AddField(
+            model_name='announcement',
+            name='fanout_mode',
+            field=models.CharField(choices=[('push', 'push'), ('pull', 'pull')], default='push', max_length=8),
+        ),
+        migrations.AlterField(
+            model_name='announcement',
+            name='fanout_mode',
+            field=models.CharField(choices=[('push', 'push'), ('pull', 'pull')], default=notices.models.default_fanout_mode, max_length=8),
+        ),
+    ]
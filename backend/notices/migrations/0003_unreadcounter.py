@@ -0,0 +1,34 @@
+# Generated by Django 5.2.7 on 2026-10-18 14:14
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill(apps, schema_editor):
+    Delivery = apps.get_model("notices", "Delivery")
+    UnreadCounter = apps.get_model("notices", "UnreadCounter")
+    rows = (Delivery.objects.exclude(state="acknowledged")
+            .filter(announcement__status="published", announcement__fanout_mode="push")
+            .values("user_id").annotate(n=models.Count("id")))
+    UnreadCounter.objects.bulk_create([UnreadCounter(user_id=r["user_id"], unread=r["n"]) for r in rows],
+                                      batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notices', '0002_announcement_fanout_mode'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UnreadCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='unread_counter', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('unread', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
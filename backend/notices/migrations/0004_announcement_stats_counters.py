@@ -0,0 +1,45 @@
+# Generated by Django 5.2.7 on 2026-10-18 14:16
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill(apps, schema_editor):
+    Announcement = apps.get_model("notices", "Announcement")
+    Delivery = apps.get_model("notices", "Delivery")
+
+    def n(**filters):
+        return Coalesce(Subquery(
+            Delivery.objects.filter(announcement_id=OuterRef("pk"), **filters)
+            .values("announcement_id").annotate(n=Count("id")).values("n")
+        ), Value(0))
+
+    Announcement.objects.update(total_count=n(), delivered_count=n(state__in=["delivered", "acknowledged"]),
+                                ack_count=n(state="acknowledged"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notices', '0003_unreadcounter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='announcement',
+            name='ack_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='announcement',
+            name='delivered_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='announcement',
+            name='total_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
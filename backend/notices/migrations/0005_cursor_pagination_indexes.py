@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-18 14:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notices', '0004_announcement_stats_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='announcement',
+            index=models.Index(fields=['status', '-created_at', '-id'], name='notices_ann_status_f2d382_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='announcement',
+            index=models.Index(fields=['publisher', '-created_at', '-id'], name='notices_ann_publish_96fed7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='delivery',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='notices_del_user_id_12bec7_idx'),
+        ),
+    ]
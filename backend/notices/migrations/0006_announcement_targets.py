@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-18 14:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notices', '0005_cursor_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='announcement',
+            name='targets',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AlterField(
+            model_name='announcement',
+            name='audience',
+            field=models.CharField(choices=[('all_students', 'All Students'), ('targeted', 'Targeted')], default='all_students', max_length=32),
+        ),
+    ]
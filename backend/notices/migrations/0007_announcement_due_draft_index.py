@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-18 14:27
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notices', '0006_announcement_targets'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='announcement',
+            index=models.Index(condition=models.Q(('status', 'draft')), fields=['publish_at'], name='notices_ann_due_draft_idx'),
+        ),
+    ]
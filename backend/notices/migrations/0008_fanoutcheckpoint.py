@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-18 14:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notices', '0007_announcement_due_draft_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FanoutCheckpoint',
+            fields=[
+                ('announcement', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='fanout_checkpoint', serialize=False, to='notices.announcement')),
+                ('last_user_id', models.BigIntegerField(default=0)),
+                ('inserted', models.PositiveIntegerField(default=0)),
+                ('done', models.BooleanField(default=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -1,22 +1,51 @@
 from django.db import models
 from django.conf import settings
 
+
+def default_fanout_mode():
+    return settings.NOTICES_BROADCAST_MODE
+
+
 class Announcement(models.Model):
     AUD_ALL_STUDENTS = "all_students"
-    AUDIENCE_CHOICES = [(AUD_ALL_STUDENTS, "All Students")]
+    AUD_TARGETED = "targeted"
+    AUDIENCE_CHOICES = [(AUD_ALL_STUDENTS, "All Students"), (AUD_TARGETED, "Targeted")]
+    # targeted 的受众：{"departments": [...], "roles": [...], "users": [用户 id]}，取并集
+    # 班级（ClassSection）还没有选课名单，无法解析出学生，暂不支持按班级定向
+    TARGET_KEYS = ("departments", "roles", "users")
 
     title = models.CharField(max_length=200)
     body = models.TextField()
     audience = models.CharField(max_length=32, choices=AUDIENCE_CHOICES, default=AUD_ALL_STUDENTS)
+    targets = models.JSONField(default=dict, blank=True)
 
     publisher = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.PROTECT, related_name="published_announcements")
     status = models.CharField(max_length=16, choices=[("draft","draft"),("published","published"),("withdrawn","withdrawn")], default="published")
     publish_at = models.DateTimeField(null=True, blank=True)
 
+    # push：发布时为受众逐人写 Delivery；pull：不写，收件箱读时计算（见 notices/inbox.py）
+    FANOUT_PUSH = "push"
+    FANOUT_PULL = "pull"
+    fanout_mode = models.CharField(max_length=8, choices=[(FANOUT_PUSH, "push"), (FANOUT_PULL, "pull")],
+                                   default=default_fanout_mode)
+
+    # 投递统计（物化）：fanout/确认时增量维护，stats 与列表 ?with_stats=1 直接读取
+    # total：push 为投递行数，pull 为发布时受众人数；delivered 含已确认
+    total_count = models.PositiveIntegerField(default=0)
+    delivered_count = models.PositiveIntegerField(default=0)
+    ack_count = models.PositiveIntegerField(default=0)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
-    class Meta: ordering = ["-created_at"]
+    class Meta:
+        ordering = ["-created_at"]
+        # 游标分页按 (-created_at, -id)：收件箱按状态、教师列表按发布者
+        indexes = [models.Index(fields=["status", "-created_at", "-id"]),
+                   models.Index(fields=["publisher", "-created_at", "-id"]),
+                   # 定时发布：只索引待发布的草稿，beat 扫描到期公告只碰这一小块
+                   models.Index(fields=["publish_at"], condition=models.Q(status="draft"),
+                                name="notices_ann_due_draft_idx")]
 
     def __str__(self): return f"{self.title} ({self.audience})"
 
@@ -24,6 +53,7 @@ class Announcement(models.Model):
 class Delivery(models.Model):
     """
     每个学生一条投递记录，保证“待确认”可追踪。
+    pull 模式的公告发布时不写这一行，学生标记/确认或被提醒时才补上（见 inbox.materialize_pull）。
     """
     STATE_CHOICES = [
         ("queued","queued"),         # 已生成投递待处理
@@ -44,6 +74,55 @@ class Delivery(models.Model):
 
     class Meta:
         unique_together = ("announcement", "user")
-        indexes = [models.Index(fields=["user", "state"]), models.Index(fields=["announcement"])]
+        indexes = [models.Index(fields=["user", "state"]), models.Index(fields=["announcement"]),
+                   models.Index(fields=["user", "-created_at", "-id"])]
+
+    def __str__(self): return f"Delivery<{self.announcement_id} -> {self.user_id}>"
+
+class UnreadCounter(models.Model):
+    """
+    每个用户未确认的 push 投递数（只含已发布公告），供 UnreadCountAPI 直接读取。
+    fanout 时累加、确认/撤回时扣减，由 reconcile_unread_counters 定期校正漂移。
+    pull 公告不在此计数（见 notices/counters.py）。
+    """
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True,
+                                related_name="unread_counter")
+    unread = models.IntegerField(default=0)
+
+    def __str__(self): return f"UnreadCounter<{self.user_id}: {self.unread}>"
+
+
+class FanoutCheckpoint(models.Model):
+    """
+    fanout 进度：按用户 id 键集分批投递，每批与投递行同一事务记下已处理到的最大用户 id，
+    失败重试从这里继续，而不是重新扫描全部用户。done 之后再次 fanout 视为新一轮补全。
+    """
+    announcement = models.OneToOneField(Announcement, on_delete=models.CASCADE, primary_key=True,
+                                        related_name="fanout_checkpoint")
+    last_user_id = models.BigIntegerField(default=0)
+    inserted = models.PositiveIntegerField(default=0)
+    done = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self): return f"FanoutCheckpoint<{self.announcement_id} @ {self.last_user_id}>"
+
+
+class DeliveryArchive(models.Model):
+    """
+    冷数据：已确认的旧投递、已撤回公告的投递从 Delivery 搬到这里（见 notices/archive.py），
+    只保留收件箱历史与统计需要的字段，热表与其索引不再随学期增长。id 沿用原投递 id。
+    """
+    id = models.BigIntegerField(primary_key=True)
+    announcement = models.ForeignKey(Announcement, on_delete=models.CASCADE, related_name="archived_deliveries")
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="archived_deliveries")
+    state = models.CharField(max_length=16, choices=Delivery.STATE_CHOICES)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+    ack_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ("announcement", "user")
+        indexes = [models.Index(fields=["user", "-created_at", "-id"])]
 
-    def __str__(self): return f"Delivery<{self.announcement_id} -> {self.user_id}>"
\ No newline at end of file
+    def __str__(self): return f"DeliveryArchive<{self.announcement_id} -> {self.user_id}>"
@@ -0,0 +1,131 @@
+"""
+公告实时推送的订阅端：ASGI 下的异步 SSE 视图。
+每个进程（事件循环）只开一个 Redis 订阅（_Hub），收到的事件分发给本进程内各连接的队列；
+连接数再多也只占一个 Redis 连接，空闲连接不占线程。需以 ASGI 运行（见 core/sse.py）。
+"""
+import asyncio
+import json
+import logging
+import time
+import weakref
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+
+from core import sse
+from jobs.progress import get_async_redis
+from . import counters
+from .events import BROADCAST, USER_PREFIX, matches
+
+logger = logging.getLogger(__name__)
+
+STREAM_MAX_SECONDS = 300
+HEARTBEAT_SECONDS = 15
+QUEUE_SIZE = 100
+UNREAD_DEBOUNCE_SECONDS = 0.5   # 用户频道的连续变化（如批量确认）合并后只重算一次未读数
+
+
+class _Hub:
+    """进程内的事件分发：一个 Redis 订阅（广播频道 + 用户频道模式），按用户把事件放进连接队列。"""
+
+    def __init__(self):
+        self._queues = defaultdict(set)   # user_id -> {asyncio.Queue}
+        self._task = None
+
+    def add(self, user_id: int, q: asyncio.Queue):
+        self._queues[user_id].add(q)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def remove(self, user_id: int, q: asyncio.Queue):
+        self._queues[user_id].discard(q)
+        if not self._queues[user_id]:
+            del self._queues[user_id]
+
+    def dispatch(self, channel: str, data: dict):
+        if channel == BROADCAST:
+            targets = [q for qs in self._queues.values() for q in qs]
+        else:
+            targets = self._queues.get(int(channel[len(USER_PREFIX):]), ())
+        for q in list(targets):
+            try:
+                q.put_nowait(data)
+            except asyncio.QueueFull:
+                pass   # 慢连接丢事件即可，重连时会拿到最新未读数
+
+    async def _run(self):
+        client = get_async_redis()
+        pubsub = client.pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.subscribe(BROADCAST)
+            await pubsub.psubscribe(f"{USER_PREFIX}*")
+            async for msg in pubsub.listen():
+                ch = msg["channel"].decode() if isinstance(msg["channel"], bytes) else msg["channel"]
+                self.dispatch(ch, json.loads(msg["data"]))
+        except Exception:
+            # 下一个新连接会重新拉起订阅
+            logger.warning("notice event subscriber stopped", exc_info=True)
+        finally:
+            await pubsub.aclose()
+            await client.aclose()
+
+
+_hubs = weakref.WeakKeyDictionary()   # 事件循环 -> _Hub
+
+
+def get_hub() -> _Hub:
+    loop = asyncio.get_running_loop()
+    if loop not in _hubs:
+        _hubs[loop] = _Hub()
+    return _hubs[loop]
+
+
+async def _events(user, hub: _Hub):
+    """
+    广播事件（新公告、撤回）原样转发，不查库：一条广播会同时到达所有在线连接，逐个重算未读数
+    就是 N 次查询。新公告事件自带 unread_delta，撤回事件带 refetch_unread，由客户端自行处理。
+    只有用户自己的状态变化（用户频道）才重算未读数，短暂合并后每个连接算一次，且不占用共享线程。
+    """
+    unread = sync_to_async(counters.unread_for, thread_sensitive=False)
+    q = asyncio.Queue(maxsize=QUEUE_SIZE)
+    hub.add(user.id, q)
+    try:
+        yield "retry: 3000\n\n"
+        yield sse.message({"unread": await unread(user)}, "unread")
+        deadline = time.monotonic() + STREAM_MAX_SECONDS
+        while (left := deadline - time.monotonic()) > 0:
+            try:
+                batch = [await asyncio.wait_for(q.get(), timeout=min(HEARTBEAT_SECONDS, left))]
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if batch[0]["type"] == "changed":
+                await asyncio.sleep(UNREAD_DEBOUNCE_SECONDS)
+            while not q.empty():
+                batch.append(q.get_nowait())
+            changed = False
+            for ev in batch:
+                # 同一个事件对象会分发给多个连接，不能原地修改
+                if not matches(ev.get("match"), user):
+                    continue
+                if ev["type"] == "changed":
+                    changed = True
+                else:
+                    yield sse.message({k: v for k, v in ev.items() if k != "match"}, ev["type"])
+            if changed:
+                yield sse.message({"unread": await unread(user)}, "unread")
+    finally:
+        hub.remove(user.id, q)
+
+
+async def notice_events(request):
+    """
+    GET /api/notices/events[?token=<access>] —— Server-Sent Events
+    事件：unread {"unread"}（连接时与自己的状态变化后）、
+    announcement {"id", "title", "unread_delta": 1}、withdrawn {"id", "title", "refetch_unread": true}。
+    超过 STREAM_MAX_SECONDS 断开，客户端按 retry 重连。
+    """
+    user = await sse.authenticate(request)
+    if user is None:
+        return sse.unauthorized()
+    return sse.stream(_events(user, get_hub()))
@@ -0,0 +1,77 @@
+"""
+未确认提醒：按用户 id 键集分批扫描未确认的接收者，每批先认领再发信：
+同一事务里写 Delivery.last_push_at / retry_count（pull 公告的接收者此时补一条 queued 投递来承载这两个字段），
+提交后用一个 SMTP 连接（send_mass_mail + get_connection）发出整批邮件。
+冷却期（NOTICES_REMIND_COOLDOWN）内提醒过的人跳过，所以超时、重试、并发重跑都不会重复发给已认领的人
+（代价是认领后发信失败的人本轮收不到）。限速不在这里 sleep，由 remind_unacked_task 按批排程（见 tasks.py）。
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import get_connection, send_mass_mail
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from users.models import User
+from .inbox import audience_users, materialize_pull_users
+from .models import Announcement, Delivery
+
+REMIND_BATCH_SIZE = 500
+
+
+def _candidates(a: Announcement, cutoff):
+    """待提醒的用户（未确认、冷却期外），按 id 排序的 (id, email) 查询集。"""
+    skip = Delivery.objects.filter(announcement=a).filter(Q(state="acknowledged") | Q(last_push_at__gt=cutoff))
+    if a.fanout_mode == Announcement.FANOUT_PULL:
+        users = audience_users(a)
+    else:
+        users = User.objects.filter(deliveries__announcement=a)
+    return users.exclude(pk__in=skip.values("user_id")).order_by("id").values_list("id", "email")
+
+
+def _message(a: Announcement, email: str):
+    body = a.body if len(a.body) <= 500 else a.body[:500] + "…"
+    return (f"[待确认] {a.title}", f"你有一条公告尚未确认：\n\n{body}\n\n前往确认：{settings.SITE_URL}/messages",
+            settings.DEFAULT_FROM_EMAIL, [email])
+
+
+def remind_batch(a: Announcement, after_id: int = 0, batch_size: int | None = None, connection=None):
+    """
+    提醒 id 大于 after_id 的下一批用户，返回 ({"reminded", "sent"}, 下一批的 after_id；没有了为 None)。
+    公告已撤回时直接结束。
+    """
+    batch_size = batch_size or REMIND_BATCH_SIZE
+    now = timezone.now()
+    cutoff = now - timedelta(seconds=settings.NOTICES_REMIND_COOLDOWN)
+    with transaction.atomic():
+        if not Announcement.objects.filter(pk=a.pk, status="published").exists():
+            return {"reminded": 0, "sent": 0}, None
+        batch = list(_candidates(a, cutoff).filter(id__gt=after_id)[:batch_size])
+        if not batch:
+            return {"reminded": 0, "sent": 0}, None
+        ids = [uid for uid, _ in batch]
+        if a.fanout_mode == Announcement.FANOUT_PULL:
+            materialize_pull_users(a, ids)
+        # 认领：锁住仍待提醒的行（并发的另一个任务跳过它们），发信前就记下提醒时间
+        claimed = list(Delivery.objects.filter(announcement=a, user_id__in=ids)
+                       .exclude(state="acknowledged").exclude(last_push_at__gt=cutoff)
+                       .select_for_update(skip_locked=True).values_list("user_id", flat=True))
+        Delivery.objects.filter(announcement=a, user_id__in=claimed).update(
+            retry_count=F("retry_count") + 1, last_push_at=now)
+    emails = dict(batch)
+    msgs = [_message(a, emails[uid]) for uid in claimed if emails[uid]]
+    sent = send_mass_mail(msgs, fail_silently=False, connection=connection) if msgs else 0
+    nxt = ids[-1] if len(batch) == batch_size else None
+    return {"reminded": len(claimed), "sent": sent}, nxt
+
+
+def remind(a: Announcement, batch_size: int = REMIND_BATCH_SIZE) -> dict:
+    """一次提醒完所有人（不限速，复用一个 SMTP 连接）；线上由 remind_unacked_task 分批排程。"""
+    total = {"reminded": 0, "sent": 0}
+    after_id = 0
+    with get_connection() as conn:
+        while after_id is not None:
+            res, after_id = remind_batch(a, after_id, batch_size, connection=conn)
+            total = {k: total[k] + res[k] for k in total}
+    return total
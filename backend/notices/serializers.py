@@ -1,18 +1,52 @@
+from django.utils import timezone
 from rest_framework import serializers
-from .models import Announcement, Delivery
+from users.models import User
+from .models import Announcement, Delivery, DeliveryArchive
 
 class AnnouncementSerializer(serializers.ModelSerializer):
     publisher_username = serializers.CharField(source="publisher.username", read_only=True)
 
     class Meta:
         model = Announcement
-        fields = ["id","title","body","audience","publisher","publisher_username","status","publish_at","created_at","updated_at"]
-        read_only_fields = ["publisher","status","created_at","updated_at"]
+        fields = ["id","title","body","audience","targets","fanout_mode","publisher","publisher_username","status",
+                  "publish_at","created_at","updated_at"]
+        read_only_fields = ["publisher","status","fanout_mode","created_at","updated_at"]
+
+    def validate(self, attrs):
+        if attrs.get("audience", Announcement.AUD_ALL_STUDENTS) != Announcement.AUD_TARGETED:
+            attrs["targets"] = {}
+            return attrs
+        targets = attrs.get("targets") or {}
+        if isinstance(targets, dict) and "sections" in targets:
+            raise serializers.ValidationError({"targets": "班级还没有选课名单，暂不支持按班级定向"})
+        if not isinstance(targets, dict) or set(targets) - set(Announcement.TARGET_KEYS):
+            raise serializers.ValidationError({"targets": f"只支持 {', '.join(Announcement.TARGET_KEYS)}"})
+        roles = {r for r, _ in User._meta.get_field("role").choices}
+        for key, items in targets.items():
+            if not isinstance(items, list):
+                raise serializers.ValidationError({"targets": f"{key} 须为列表"})
+            if key == "users" and not all(isinstance(x, int) and not isinstance(x, bool) for x in items):
+                raise serializers.ValidationError({"targets": f"{key} 须为整数 id 列表"})
+            if key == "departments" and not all(isinstance(x, str) and x for x in items):
+                raise serializers.ValidationError({"targets": "departments 须为非空字符串列表"})
+            if key == "roles" and not set(items) <= roles:
+                raise serializers.ValidationError({"targets": f"roles 只能是 {', '.join(sorted(roles))}"})
+        if not any(targets.values()):
+            raise serializers.ValidationError({"targets": "定向公告至少需要一个受众"})
+        attrs["targets"] = {k: v for k, v in targets.items() if v}
+        # pull 模式只支持全体学生公告，定向公告总是 push
+        attrs["fanout_mode"] = Announcement.FANOUT_PUSH
+        return attrs
 
     def create(self, validated):
         validated["publisher"] = self.context["request"].user
-        # MVP：创建即发布
-        validated["status"] = "published"
+        # publish_at 在将来：存为草稿，到期由 beat 任务发布；否则创建即发布
+        now = timezone.now()
+        if validated.get("publish_at") and validated["publish_at"] > now:
+            validated["status"] = "draft"
+        else:
+            validated["status"] = "published"
+            validated["publish_at"] = validated.get("publish_at") or now
         return super().create(validated)
 
 
@@ -28,9 +62,27 @@ class DeliverySerializer(serializers.ModelSerializer):
                   "state","delivered_at","ack_at","created_at"]
 
 
+class ArchivedDeliverySerializer(DeliverySerializer):
+    """归档收件箱（?archived=1）的行，字段与 DeliverySerializer 相同。"""
+    class Meta(DeliverySerializer.Meta):
+        model = DeliveryArchive
+
+
 class AnnouncementStatsSerializer(serializers.Serializer):
     id = serializers.IntegerField()
     title = serializers.CharField()
-    total = serializers.IntegerField()
+    total = serializers.IntegerField(source="total_count")
+    delivered_count = serializers.IntegerField()
     ack_count = serializers.IntegerField()
-    ack_rate = serializers.FloatField()
\ No newline at end of file
+    ack_rate = serializers.SerializerMethodField()
+
+    def get_ack_rate(self, a):
+        return a.ack_count / a.total_count if a.total_count else 0.0
+
+
+class AnnouncementWithStatsSerializer(AnnouncementSerializer):
+    """列表 ?with_stats=1：统计是公告行上的物化字段，一页公告一次查询。"""
+    stats = AnnouncementStatsSerializer(source="*", read_only=True)
+
+    class Meta(AnnouncementSerializer.Meta):
+        fields = AnnouncementSerializer.Meta.fields + ["stats"]
\ No newline at end of file
@@ -1,35 +1,100 @@
+from functools import partial
+
 from celery import shared_task
-from django.utils import timezone
+from django.conf import settings
 from django.db import transaction
-from .models import Announcement, Delivery
-from users.models import User
+from django.utils import timezone
+
+from . import archive, counters, events
+from .fanout import fanout
+from .inbox import audience_users
+from .models import Announcement
+from .reminders import remind_batch
+
+PUBLISH_BATCH_SIZE = 100
+
+
+def start_delivery(a: Announcement):
+    """公告发布后开始投递：push 异步 fanout；pull 不写投递，只记下受众人数作为统计总数。"""
+    if a.fanout_mode == Announcement.FANOUT_PUSH:
+        fanout_announcement.delay(a.id)
+    else:
+        Announcement.objects.filter(pk=a.pk).update(total_count=audience_users(a).count())
+        events.announce(a)
 
-BATCH_SIZE = 1000
 
 @shared_task(bind=True, autoretry_for=(Exception,), retry_backoff=3, max_retries=3)
-def fanout_all_students(self, announcement_id: int):
+def fanout_announcement(self, announcement_id: int):
+    """
+    按公告受众创建/补全 Delivery（幂等），有新投递时通知在线的接收者。
+    失败自动重试时从 FanoutCheckpoint 继续；公告撤回后不再投递。
+    重跑（重试、旧任务名转投）没有新插入时不再广播，客户端不会对同一公告重复 unread_delta。
+    """
+    n = fanout(announcement_id)
+    a = Announcement.objects.get(pk=announcement_id)
+    if n and a.status == "published":
+        events.announce(a)
+    return {"ok": n}
+
+
+@shared_task
+def fanout_all_students(announcement_id: int):
+    """旧任务名，保留给升级前已入队的消息：转投给 fanout_announcement（带重试与断点续投）。"""
+    fanout_announcement.delay(announcement_id)
+
+
+@shared_task
+def reconcile_unread_counters():
+    """定期按投递表校正未读计数与公告统计（beat 调度），返回被校正的用户数/公告数。"""
+    return {"fixed": counters.reconcile(), "stats_fixed": counters.reconcile_stats()}
+
+
+@shared_task
+def archive_deliveries():
+    """把已撤回公告、已确认的旧投递搬进归档表（beat 每天调度），返回搬走的行数。"""
+    return {"archived": archive.archive()}
+
+
+@shared_task(bind=True, autoretry_for=(Exception,), retry_backoff=30, max_retries=3)
+def remind_unacked_task(self, announcement_id: int, after_id: int = 0, reminded: int = 0, sent: int = 0):
+    """
+    给未确认的接收者发提醒邮件。每次只发一批（远在任务超时之内），还有剩余就 replace 成下一批，
+    countdown 按 NOTICES_REMIND_RATE 折算（不在 worker 里 sleep）；累计结果最终落在最初的任务 id 上。
+    重试只重做当前批，已认领的人在冷却期内不会重复收到。
+    """
+    a = Announcement.objects.filter(pk=announcement_id, status="published").first()
+    if a is None:
+        return {"reminded": reminded, "sent": sent}
+    res, after_id = remind_batch(a, after_id)
+    reminded, sent = reminded + res["reminded"], sent + res["sent"]
+    if after_id is None:
+        return {"reminded": reminded, "sent": sent}
+    rate = settings.NOTICES_REMIND_RATE
+    countdown = res["sent"] / rate if rate > 0 else 0
+    return self.replace(
+        remind_unacked_task.si(announcement_id, after_id, reminded, sent).set(countdown=countdown))
+
+
+@shared_task
+def publish_due_announcements():
     """
-    为全体学生创建/补全 Delivery（幂等）。
+    发布到期的定时公告（beat 每分钟调度）。
+    用 SELECT ... FOR UPDATE SKIP LOCKED 认领：多个 beat/worker 同时跑也不会重复认领，
+    状态从 draft 改为 published 与认领同一事务，提交后才开始投递，每条公告只 fanout 一次。
     """
-    qs = User.objects.filter(role="student").values_list("id", flat=True).iterator()
-    now = timezone.now()
-    created = 0
-    batch = []
-    for uid in qs:
-        batch.append(Delivery(announcement_id=announcement_id, user_id=uid, state="queued", created_at=now))
-        if len(batch) >= BATCH_SIZE:
-            _bulk_upsert(batch); created += len(batch); batch.clear()
-    if batch:
-        _bulk_upsert(batch); created += len(batch)
-    return {"ok": created}
-
-def _bulk_upsert(objs):
-    # Django <5.1 无真正 upsert；这里先尝试 create，再忽略唯一冲突（MVP 可接受）。
-    # 若 Django 5.1+ 可用 bulk_create(..., ignore_conflicts=True)
-    from django.db import IntegrityError
-    try:
-        Delivery.objects.bulk_create(objs, ignore_conflicts=True)
-    except IntegrityError:
-        # 极端情况下退回逐条 get_or_create
-        for o in objs:
-            Delivery.objects.get_or_create(announcement_id=o.announcement_id, user_id=o.user_id, defaults={"state":"queued"})
\ No newline at end of file
+    published = 0
+    while True:
+        with transaction.atomic():
+            now = timezone.now()
+            due = list(Announcement.objects.filter(status="draft", publish_at__lte=now)
+                       .order_by("publish_at").select_for_update(skip_locked=True)[:PUBLISH_BATCH_SIZE])
+            if not due:
+                break
+            Announcement.objects.filter(pk__in=[a.pk for a in due]).update(status="published", updated_at=now)
+            for a in due:
+                a.status = "published"
+                transaction.on_commit(partial(start_delivery, a))
+        published += len(due)
+        if len(due) < PUBLISH_BATCH_SIZE:
+            break
+    return {"published": published}
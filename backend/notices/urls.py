@@ -1,6 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import AnnouncementViewSet, DeliveryViewSet, UnreadCountAPI
+from .realtime import notice_events
 
 router = DefaultRouter()
 router.register(r"announcements", AnnouncementViewSet, basename="announcement")
@@ -9,4 +10,5 @@ router.register(r"deliveries", DeliveryViewSet, basename="delivery")
 urlpatterns = [
     path("", include(router.urls)),
     path("unread_count", UnreadCountAPI.as_view()),
+    path("notices/events", notice_events),
 ]
\ No newline at end of file
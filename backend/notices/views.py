@@ -4,30 +4,60 @@ from rest_framework import viewsets, mixins, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db import models  # ✅ 加这一行
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+from rest_framework.utils.urls import replace_query_param
+from django.db import models, transaction  # ✅ 加这一行
 
-from .models import Announcement, Delivery
-from .serializers import AnnouncementSerializer, DeliverySerializer, AnnouncementStatsSerializer
+from .models import Announcement, Delivery, DeliveryArchive
+from .serializers import (AnnouncementSerializer, DeliverySerializer, AnnouncementStatsSerializer,
+                          AnnouncementWithStatsSerializer, ArchivedDeliverySerializer)
 from .permissions import IsTeacherOrAdminCanWrite
-from .tasks import fanout_all_students
+from .tasks import remind_unacked_task, start_delivery
+from .inbox import (bulk_mark, compact_page, decode_cursor, encode_cursor, in_audience, inbox_page,
+                    inbox_queryset, mark, set_state)
+from . import counters, events
+
+class CreatedCursorPagination(CursorPagination):
+    """
+    按 (-created_at, -id) 的游标分页：翻到多深都只是一次索引范围扫描 + LIMIT，
+    响应为 {"next", "previous", "results"}。
+    """
+    ordering = ("-created_at", "-id")
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
 
 class AnnouncementViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin,
                           mixins.CreateModelMixin, viewsets.GenericViewSet):
     queryset = Announcement.objects.all().select_related("publisher")
     serializer_class = AnnouncementSerializer
     permission_classes = [IsAuthenticated & IsTeacherOrAdminCanWrite]
+    pagination_class = CreatedCursorPagination
 
     def get_permissions(self):
         if self.action in ("list","retrieve"):
             return [IsAuthenticated()]
         return super().get_permissions()
 
+    def get_serializer_class(self):
+        # ?with_stats=1：列表直接带上确认统计，免得前端逐条请求 stats
+        if (self.action == "list" and self.request.query_params.get("with_stats") == "1"
+                and self.request.user.role != "student"):
+            return AnnouncementWithStatsSerializer
+        return super().get_serializer_class()
+
     def get_queryset(self):
         u = self.request.user
         qs = super().get_queryset()
         # 学生只能看已发布且未撤回；教师默认看自己发布；管理员看全部
         if u.role == "student":
-            return qs.filter(status="published")
+            # 定向公告只有受众能看到：热表或归档表里有自己的投递
+            mine = Delivery.objects.filter(user=u).values("announcement_id")
+            archived = DeliveryArchive.objects.filter(user=u).values("announcement_id")
+            return qs.filter(Q(audience=Announcement.AUD_ALL_STUDENTS) | Q(pk__in=mine) | Q(pk__in=archived),
+                             status="published")
         elif u.role in ("teacher",):
             mine = self.request.query_params.get("mine")
             return qs.filter(publisher=u) if mine != "0" else qs
@@ -35,8 +65,9 @@ class AnnouncementViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin,
 
     def perform_create(self, serializer):
         a = serializer.save()
-        # 立即 fanout（异步）
-        fanout_all_students.delay(a.id)
+        # 立即开始投递（push 异步 fanout）；定时公告由 publish_due_announcements 到期发布
+        if a.status == "published":
+            start_delivery(a)
 
     @action(detail=True, methods=["post"], permission_classes=[IsAuthenticated & IsTeacherOrAdminCanWrite])
     def withdraw(self, request, pk=None):
@@ -44,60 +75,144 @@ class AnnouncementViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin,
         # 只有发布者/管理员允许撤回（管理员与 registrar 无限制）
         if request.user.role == "teacher" and a.publisher_id != request.user.id:
             return Response({"detail":"Forbidden"}, status=403)
-        a.status = "withdrawn"; a.save(update_fields=["status","updated_at"])
+        if a.status == "withdrawn":
+            return Response({"ok": True})
+        with transaction.atomic():
+            # 先锁公告行：正在进行的 fanout 批次提交后才扣未读，之后的批次看到 withdrawn 不再插入
+            a = Announcement.objects.select_for_update().get(pk=a.pk)
+            if a.status == "withdrawn":
+                return Response({"ok": True})
+            if a.status == "published":
+                counters.on_withdraw(a)
+            a.status = "withdrawn"; a.save(update_fields=["status","updated_at"])
+            transaction.on_commit(lambda: events.announce(a, "withdrawn"))
         # 可以选择把未确认的 Delivery 标记成 delivered（或保留排查）
         return Response({"ok": True})
 
     @action(detail=True, methods=["get"], permission_classes=[IsAuthenticated & IsTeacherOrAdminCanWrite])
     def stats(self, request, pk=None):
         a = self.get_object()
-        total = Delivery.objects.filter(announcement=a).count()
-        ack = Delivery.objects.filter(announcement=a, state="acknowledged").count()
-        data = {"id": a.id, "title": a.title, "total": total, "ack_count": ack, "ack_rate": (ack/total if total else 0.0)}
-        ser = AnnouncementStatsSerializer(data);  # dataclass-like
-        return Response(data)
+        return Response(AnnouncementStatsSerializer(a).data)
 
     @action(detail=True, methods=["post"], permission_classes=[IsAuthenticated & IsTeacherOrAdminCanWrite])
     def remind_unacked(self, request, pk=None):
-        # MVP：这里只更新 retry_count（真实二次提醒可接 Celery 或邮件）
+        # 异步发提醒邮件，进度/结果可经 /api/tasks/<task_id> 查询
         a = self.get_object()
-        qs = Delivery.objects.filter(announcement=a).exclude(state="acknowledged")
-        updated = qs.update(retry_count=models.F("retry_count")+1, last_push_at=timezone.now())
-        return Response({"reminded": updated})
+        if a.status != "published":
+            return Response({"detail":"公告未发布或已撤回"}, status=400)
+        r = remind_unacked_task.delay(a.id)
+        return Response({"task_id": r.id}, status=status.HTTP_202_ACCEPTED)
+
+    # 按公告标记（push/pull 通用；pull 公告首次标记时才生成 Delivery）
+    @action(detail=True, methods=["post"], permission_classes=[IsAuthenticated])
+    def delivered(self, request, pk=None):
+        return self._mark(request, "delivered")
+
+    @action(detail=True, methods=["post"], permission_classes=[IsAuthenticated])
+    def ack(self, request, pk=None):
+        return self._mark(request, "acknowledged")
+
+    def _mark(self, request, state):
+        a = self.get_object()
+        if not (Delivery.objects.filter(announcement=a, user=request.user).exists() or in_audience(a, request.user)):
+            return Response({"detail":"Forbidden"}, status=403)
+        mark(a, request.user, state)
+        return Response({"ok": True})
+
+
+def _id_list(value):
+    if not isinstance(value, list) or not all(isinstance(x, int) and not isinstance(x, bool) for x in value):
+        raise ValueError
+    return value
 
 
 class DeliveryViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
     serializer_class = DeliverySerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = CreatedCursorPagination
+
+    def _archived(self):
+        return self.action == "list" and self.request.query_params.get("archived") in ("1", "true")
+
+    def get_serializer_class(self):
+        if self._archived():
+            return ArchivedDeliverySerializer
+        return DeliverySerializer
 
     def get_queryset(self):
         u = self.request.user
-        qs = Delivery.objects.filter(user=u).select_related("announcement","announcement__publisher")
-        state = self.request.query_params.get("state")
-        if state == "pending":
-            qs = qs.exclude(state="acknowledged")
-        return qs.order_by("-created_at")
+        if self.action != "list":
+            return Delivery.objects.filter(user=u)
+        # ?archived=1：已归档的历史投递（单独的表，走 (user, -created_at, -id) 索引）
+        if self._archived():
+            return (DeliveryArchive.objects.filter(user=u, announcement__status="published")
+                    .select_related("announcement", "announcement__publisher"))
+        return inbox_queryset(u)
+
+    def list(self, request, *args, **kwargs):
+        """
+        收件箱：投递行 + 还没有投递行的 pull 公告（id 为 null），两路键集归并分页（见 inbox.inbox_page），只读。
+        响应与游标分页一致：{"next", "previous", "results"}；只能往后翻，previous 恒为 null。
+        ?state=pending 只看未确认的；?compact=1 额外给 "publishers": {id: username}，正文只给摘要。
+        """
+        if self._archived():
+            return super().list(request, *args, **kwargs)
+        params = request.query_params
+        try:
+            after = decode_cursor(params.get(self.paginator.cursor_query_param))
+        except ValueError:
+            raise NotFound(self.paginator.invalid_cursor_message)
+        compact = params.get("compact") == "1"
+        rows, nxt = inbox_page(request.user, after, self.paginator.get_page_size(request),
+                               pending=params.get("state") == "pending", compact=compact)
+        data = {"next": None, "previous": None}
+        if nxt:
+            data["next"] = replace_query_param(request.build_absolute_uri(), self.paginator.cursor_query_param,
+                                               encode_cursor(nxt))
+        if compact:
+            data.update(compact_page(rows))
+        else:
+            data["results"] = self.get_serializer(rows, many=True).data
+        return Response(data)
 
     @action(detail=True, methods=["post"])
     def delivered(self, request, pk=None):
         d = self.get_object()
         if d.user_id != request.user.id: return Response({"detail":"Forbidden"}, status=403)
-        if d.state == "queued":
-            d.state = "delivered"; d.delivered_at = timezone.now(); d.save(update_fields=["state","delivered_at"])
+        set_state(d, d.announcement, "delivered")
         return Response({"ok": True})
 
     @action(detail=True, methods=["post"])
     def ack(self, request, pk=None):
         d = self.get_object()
         if d.user_id != request.user.id: return Response({"detail":"Forbidden"}, status=403)
-        if d.state != "acknowledged":
-            d.state = "acknowledged"; d.ack_at = timezone.now(); d.save(update_fields=["state","ack_at"])
+        set_state(d, d.announcement, "acknowledged")
         return Response({"ok": True})
 
+    # 批量：{"ids": [投递 id]} / {"announcements": [公告 id]} / {"all": true}，一条条件 UPDATE
+    @action(detail=False, methods=["post"])
+    def bulk_delivered(self, request):
+        return self._bulk(request, "delivered")
+
+    @action(detail=False, methods=["post"])
+    def bulk_ack(self, request):
+        return self._bulk(request, "acknowledged")
+
+    def _bulk(self, request, state):
+        data = request.data
+        try:
+            ids = _id_list(data["ids"]) if "ids" in data else None
+            anns = _id_list(data["announcements"]) if "announcements" in data else None
+        except ValueError:
+            return Response({"detail":"ids/announcements 须为整数列表"}, status=400)
+        if ids is None and anns is None and data.get("all") is not True:
+            return Response({"detail":"需要 ids、announcements 或 all=true"}, status=400)
+        return Response({"updated": bulk_mark(request.user, state, ids=ids, announcement_ids=anns)})
+
 from rest_framework.views import APIView
 
 class UnreadCountAPI(APIView):
     permission_classes = [IsAuthenticated]
     def get(self, request):
-        c = Delivery.objects.filter(user=request.user).exclude(state="acknowledged").count()
+        c = counters.unread_for(request.user)
         return Response({"unread": c})
\ No newline at end of file
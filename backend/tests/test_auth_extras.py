@@ -0,0 +1,18 @@
+import pytest
+from rest_framework.test import APIClient
+
+from users.tasks import send_email_task
+
+
+@pytest.mark.django_db
+def test_forgot_endpoints_survive_broker_outage(users, monkeypatch):
+    def down(*args, **kwargs):
+        raise ConnectionError("broker down")
+    monkeypatch.setattr(send_email_task, "delay", down)
+    users["s"].email = "s1@example.com"; users["s"].save()
+
+    api = APIClient()
+    res = api.post("/auth/forgot_password", {"email": "s1@example.com"}, format="json")
+    assert res.status_code == 200 and res.data["detail"] == "若邮箱存在，我们已发送重置邮件"
+    res = api.post("/auth/forgot_username", {"email": "s1@example.com"}, format="json")
+    assert res.status_code == 200
@@ -0,0 +1,35 @@
+import pytest
+from django.db import connection
+
+from catalog.models import Course
+from conftest import login
+
+
+@pytest.fixture
+def courses(db):
+    Course.objects.bulk_create([
+        Course(code="CS101", title="Introduction to Programming", description="Python basics and algorithms"),
+        Course(code="MA201", title="线性代数", description="矩阵、行列式与线性方程组"),
+        Course(code="PH110", title="General Physics", description="Mechanics"),
+    ])
+
+
+@pytest.mark.django_db
+def test_course_search_matches_code_and_title(api, users, courses):
+    login(api, "s1")
+    codes = lambda q: [c["code"] for c in api.get("/api/courses/", {"search": q}).data]
+    assert codes("cs1") == ["CS101"]
+    assert codes("线性") == ["MA201"]
+    assert codes("physics") == ["PH110"]
+
+
+@pytest.mark.django_db
+def test_course_search_fulltext_rank_and_headline(api, users, courses):
+    if connection.vendor != "postgresql":
+        pytest.skip("全文 / 三元组检索只在 PostgreSQL 上启用")
+    login(api, "s1")
+    rows = api.get("/api/courses/", {"search": "algorithms"}).data
+    assert [r["code"] for r in rows] == ["CS101"]                 # description 也能搜
+    assert "<mark>algorithms</mark>" in rows[0]["search_headline"]
+    assert [r["code"] for r in api.get("/api/courses/", {"search": "行列式"}).data] == ["MA201"]
+    assert [r["code"] for r in api.get("/api/courses/", {"search": "programing"}).data] == ["CS101"]   # 拼写容错
@@ -119,4 +119,32 @@ def test_section_permissions_and_unique(api: APIClient, users):
     except Exception:
         print("返回内容:", r4.content)
     assert r4.status_code in (400, 409), r4.content
-    print("✅ 唯一约束验证成功")
\ No newline at end of file
+    print("✅ 唯一约束验证成功")
+
+@pytest.mark.django_db
+def test_course_list_conditional_get(api: APIClient, users, django_assert_max_num_queries):
+    Course.objects.create(code="CS101", title="Intro")
+    login(api, "s1")
+    r = api.get("/api/courses/")
+    etag = r["ETag"]
+    assert r.status_code == 200 and "Last-Modified" in r
+
+    # 没变：一条聚合查询就回 304，不取明细
+    with django_assert_max_num_queries(2):   # 认证用户 + 聚合
+        r = api.get("/api/courses/", HTTP_IF_NONE_MATCH=etag)
+    assert r.status_code == 304 and r["ETag"] == etag
+    assert api.get("/api/courses/?search=CS", HTTP_IF_NONE_MATCH=etag).status_code == 200   # 查询参数不同
+
+    c = Course.objects.create(code="CS102", title="X")
+    assert api.get("/api/courses/", HTTP_IF_NONE_MATCH=etag).status_code == 200   # 新增
+    etag = api.get("/api/courses/")["ETag"]
+    c.delete()
+    assert api.get("/api/courses/", HTTP_IF_NONE_MATCH=etag).status_code == 200   # 删除
+
+    # 详情：对象自己的 ETag，改了之后失效
+    c = Course.objects.get(code="CS101")
+    detail = api.get(f"/api/courses/{c.id}/")["ETag"]
+    assert api.get(f"/api/courses/{c.id}/", HTTP_IF_NONE_MATCH=detail).status_code == 304
+    c.title = "Intro 2"; c.save()
+    r = api.get(f"/api/courses/{c.id}/", HTTP_IF_NONE_MATCH=detail)
+    assert r.status_code == 200 and r.data["title"] == "Intro 2"
@@ -0,0 +1,326 @@
+import csv
+import io
+import json
+
+import pytest
+from django.core.files.storage import default_storage
+
+from catalog.models import Course
+from django.core.files.base import ContentFile
+
+from jobs.tasks import export_courses_task, import_courses_task
+
+
+@pytest.fixture
+def media(settings, tmp_path):
+    # 导入/导出文件落到临时目录，避免污染 backend/media
+    settings.MEDIA_ROOT = tmp_path
+    return tmp_path
+
+
+def _read_csv(path):
+    with default_storage.open(path, "rb") as f:
+        return list(csv.DictReader(io.StringIO(f.read().decode("utf-8-sig"))))
+
+
+@pytest.mark.django_db
+def test_export_streams_all_rows(media, monkeypatch):
+    # 把块大小调小，确保跨越多个块写入
+    monkeypatch.setattr("jobs.tasks.EXPORT_CHUNK_ROWS", 7)
+    for i in range(50):
+        Course.objects.create(code=f"CS{i:03d}", title=f"T{i}", description="a\nb", credits="2.0")
+
+    res = export_courses_task({})
+    assert res["status"] == "success"
+    assert res["count"] == 50
+
+    path = res["download_url"].split("/media/", 1)[1]
+    rows = _read_csv(path)
+    assert len(rows) == 50
+    assert rows[0]["code"] == "CS000"
+    assert rows[0]["description"] == "a b"
+
+
+@pytest.mark.django_db
+def test_export_with_filters(media):
+    Course.objects.create(code="CS101", title="Intro")
+    Course.objects.create(code="MA101", title="Calculus")
+
+    res = export_courses_task({"code": "cs"})
+    assert res["count"] == 1
+
+
+def _put_csv(text: str, name="imports/courses/t.csv"):
+    return default_storage.save(name, ContentFile(text.encode("utf-8-sig")))
+
+
+@pytest.mark.django_db
+def test_import_batched_upsert(media, monkeypatch):
+    # 前 4 条合法行（含重复的 CS101）落在同一批，覆盖批内去重
+    monkeypatch.setattr("jobs.importer.IMPORT_BATCH_SIZE", 4)
+    Course.objects.create(code="CS100", title="old", credits="1.0")
+    path = _put_csv(
+        "id,code,title,description,credits\n"
+        ",CS100,New title,d,4\n"        # 更新已有课程
+        ",CS101,A,,x\n"                 # credits 非法 -> 默认 3.0
+        ",CS102,B,,2.5\n"
+        ",CS101,A2,,3\n"                # 同 code 后写覆盖
+        ",,no code,,1\n"                # 失败：缺 code
+        ",CS103,C,,500\n"               # 失败：学分超出范围
+    )
+
+    res = import_courses_task(path)
+    assert res["ok"] == 4
+    assert res["fail"] == 2
+    assert [e["line"] for e in res["errors"]] == [6, 7]
+
+    c = Course.objects.get(code="CS100")
+    assert (c.title, str(c.credits)) == ("New title", "4.0")
+    assert Course.objects.get(code="CS101").title == "A2"
+    assert str(Course.objects.get(code="CS102").credits) == "2.5"
+    assert Course.objects.count() == 3
+
+
+@pytest.mark.django_db
+def test_import_fallback_counts_only_persisted_rows(monkeypatch):
+    from django.db import DatabaseError
+    from jobs.importer import CourseImporter
+
+    real = CourseImporter._upsert
+
+    def upsert(self, items):
+        if any(f["code"] == "BAD" for f in items):
+            raise DatabaseError("boom")
+        return real(self, items)
+
+    monkeypatch.setattr(CourseImporter, "_upsert", upsert)
+    imp = CourseImporter(batch_size=10)
+    for line, code in enumerate(["CS1", "BAD", "CS1", "BAD", "CS2"], start=2):
+        imp.feed(line, {"code": code, "title": "t"})
+    res = imp.result()
+    assert (res["ok"], res["fail"]) == (3, 2)
+    assert [(e["line"], e["code"]) for e in res["errors"]] == [(3, "BAD"), (5, "BAD")]
+    assert set(Course.objects.values_list("code", flat=True)) == {"CS1", "CS2"}
+
+
+@pytest.mark.django_db
+def test_sharded_import_covers_every_line(media):
+    from jobs.tasks import import_courses_shard_task, merge_import_results, partition_csv
+
+    lines = "".join(f",CS{i:04d},Title {i},,2\n" for i in range(200))
+    # 第 202 条记录带引号的多行字段；CS0005 在文件末尾再出现一次（应以最后一行为准）；第 204 条缺 code
+    text = ("id,code,title,description,credits\n" + lines
+            + ',CS9000,Multi,"line1\nline2",3\n'
+            + ",CS0005,Last wins,,4\n"
+            + ",,bad,,1\n")
+    path = _put_csv(text)
+
+    paths = partition_csv(path, 4, "imports/shards/t")
+    assert len(paths) == 4
+    results = [import_courses_shard_task(p, n) for n, p in enumerate(paths)]
+    res = merge_import_results(results)
+    assert (res["ok"], res["fail"], res["shards"]) == (202, 1, 4)
+    assert res["errors"][0]["line"] == 204
+    assert Course.objects.count() == 201
+    assert Course.objects.get(code="CS9000").description == "line1\nline2"
+    assert Course.objects.get(code="CS0005").title == "Last wins"
+    assert not any(default_storage.exists(p) for p in paths)
+
+
+@pytest.mark.django_db
+def test_iter_lines_handles_bom_and_quoted_newlines(media):
+    from jobs.utils_storage import iter_lines
+
+    text = 'code,title,description\r\nCS1,"A, B","line1\nline2"\r\nCS2,C,\r\n'
+    with_bom = default_storage.save("imports/bom.csv", ContentFile(text.encode("utf-8-sig")))
+    no_bom = default_storage.save("imports/plain.csv", ContentFile(text.encode("utf-8")))
+
+    for path in (with_bom, no_bom):
+        rows = list(csv.DictReader(iter_lines(path)))
+        assert [r["code"] for r in rows] == ["CS1", "CS2"]
+        assert rows[0]["title"] == "A, B"
+        assert rows[0]["description"] == "line1\nline2"
+
+
+def test_url_source_streams_over_urllib3(monkeypatch):
+    import gzip
+    import urllib3
+    from jobs import utils_storage
+
+    text = 'code,title\r\nCS1,"A\nB"\r\n'
+    calls = []
+    def fake_request(method, url, preload_content=True, decode_content=True):
+        calls.append((url, preload_content))
+        return urllib3.HTTPResponse(body=io.BytesIO(gzip.compress(text.encode())), status=200,
+                                    headers={"Content-Encoding": "gzip"}, preload_content=preload_content,
+                                    decode_content=decode_content)
+    monkeypatch.setattr(utils_storage._http, "request", fake_request)
+
+    rows = list(csv.DictReader(utils_storage.iter_lines("https://files.local/c.csv")))
+    assert rows == [{"code": "CS1", "title": "A\nB"}]
+    assert calls == [("https://files.local/c.csv", False)]   # 不预读，边下载边解析
+
+    monkeypatch.setattr(utils_storage._http, "request",
+                        lambda *a, **kw: urllib3.HTTPResponse(body=io.BytesIO(b""), status=404, preload_content=False))
+    with pytest.raises(OSError):
+        utils_storage.open_binary("https://files.local/missing.csv")
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("fmt", ["csv.gz", "csv.zst", "parquet", "xlsx"])
+def test_export_formats(media, monkeypatch, fmt):
+    # 可选依赖缺失时跳过对应格式
+    dep = {"csv.zst": "zstandard", "parquet": "pyarrow", "xlsx": "openpyxl"}.get(fmt)
+    if dep:
+        pytest.importorskip(dep)
+    monkeypatch.setattr("jobs.tasks.EXPORT_CHUNK_ROWS", 4)  # 多个行组
+    for i in range(10):
+        Course.objects.create(code=f"CS{i:03d}", title=f"课程{i}", credits="2.5")
+
+    res = export_courses_task({}, fmt)
+    assert res["count"] == 10
+    assert res["download_url"].endswith("." + fmt)
+    path = res["download_url"].split("/media/", 1)[1]
+
+    if fmt == "csv.gz":
+        import gzip
+        with default_storage.open(path, "rb") as f:
+            text = gzip.decompress(f.read()).decode("utf-8-sig")
+        assert len(list(csv.DictReader(io.StringIO(text)))) == 10
+    elif fmt == "csv.zst":
+        import zstandard as zstd
+        with default_storage.open(path, "rb") as f:
+            text = zstd.ZstdDecompressor().stream_reader(f).read().decode("utf-8-sig")
+        assert len(list(csv.DictReader(io.StringIO(text)))) == 10
+    elif fmt == "parquet":
+        import pyarrow.parquet as pq
+        pf = pq.ParquetFile(default_storage.path(path))
+        assert pf.metadata.num_rows == 10
+        assert pf.metadata.num_row_groups == 3
+        assert pf.read().column("title").to_pylist()[1] == "课程1"
+    else:
+        import openpyxl
+        ws = openpyxl.load_workbook(default_storage.path(path), read_only=True).active
+        rows = list(ws.values)
+        assert rows[0][1] == "code" and len(rows) == 11
+
+
+@pytest.mark.django_db
+def test_export_api_rejects_unknown_format(api, users):
+    from conftest import login
+
+    login(api, "m1")
+    r = api.post("/api/exports/courses", {"format": "pdf"}, format="json")
+    assert r.status_code == 400
+
+
+@pytest.mark.django_db
+def test_incremental_export_watermark(media, users, settings):
+    from datetime import timedelta
+    from django.utils import timezone
+    from jobs.models import ExportWatermark
+
+    old = Course.objects.create(code="CS001", title="old")
+    Course.objects.filter(pk=old.pk).update(updated_at=timezone.now() - timedelta(days=2))
+    Course.objects.create(code="CS002", title="new")
+
+    since = (timezone.now() - timedelta(days=1)).isoformat()
+    res = export_courses_task({}, "csv", since=since, watermark_user_id=users["m"].id)
+    assert res["count"] == 1
+    wm = ExportWatermark.objects.get(user=users["m"], scope=ExportWatermark.scope_for({}))
+    assert res["watermark"] == wm.watermark.isoformat()
+    # 水位线留出余量，不取刚扫到的 max(updated_at)
+    assert wm.watermark <= timezone.now() - timedelta(seconds=settings.EXPORT_WATERMARK_LAG)
+
+    # 扫描之后才提交、但 updated_at 更早的行（并发事务）下次仍能导出；余量内的行会重复导出
+    late = Course.objects.create(code="CS003", title="late")
+    Course.objects.filter(pk=late.pk).update(updated_at=timezone.now() - timedelta(seconds=60))
+    res2 = export_courses_task({}, "csv", since=res["watermark"])
+    assert res2["count"] == 2
+    assert res2["watermark"] >= res["watermark"]
+
+    old_wm = (timezone.now() - timedelta(hours=1)).isoformat()
+    Course.objects.filter(code__in=["CS002", "CS003"]).update(updated_at=timezone.now() - timedelta(hours=2))
+    res3 = export_courses_task({}, "csv", since=old_wm)
+    assert (res3["count"], res3["watermark"]) == (0, old_wm)
+
+
+@pytest.mark.django_db
+def test_export_cache_reuses_artifact(media):
+    from jobs.export_cache import cache_key, normalize_filters, purge_expired, reserve
+    from jobs.models import ExportCacheEntry
+
+    Course.objects.create(code="CS101", title="Intro")
+    Course.objects.create(code="EE101", title="Circuits")
+    # 共用一个 key 的筛选条件，规范化后交给任务导出的行也必须相同
+    a, b = normalize_filters({"code": " CS "}), normalize_filters({"code": "cs", "title": ""})
+    key = cache_key(a, "csv", None)
+    assert key == cache_key(b, "csv", None)
+    codes = []
+    for f in (a, b):
+        res = export_courses_task(f, "csv")
+        codes.append([r["code"] for r in _read_csv(res["download_url"].split("/media/", 1)[1])])
+    assert codes == [["CS101"], ["CS101"]]
+
+    entry, created = reserve(key, "t1")
+    assert created
+    # 在途任务：相同请求挂到同一个任务上
+    again, created = reserve(key, "t2")
+    assert not created and again.task_id == "t1"
+
+    res = export_courses_task({"code": "cs"}, "csv", cache_key=key)
+    entry.refresh_from_db()
+    assert entry.path and entry.count == res["count"] == 1
+    assert default_storage.exists(entry.path)
+
+    # 目录变化 -> 版本变化 -> 不再命中
+    Course.objects.create(code="CS102", title="More")
+    assert cache_key({"code": "cs"}, "csv", None) != key
+
+    # 过期后清理连同存储对象一起删除
+    ExportCacheEntry.objects.update(expires_at=entry.created_at)
+    assert purge_expired() == 1
+    assert not default_storage.exists(entry.path)
+
+
+@pytest.mark.django_db
+def test_bench_measure_counts_every_query():
+    from django.db import connection
+    from jobs.bench import measure
+
+    def many():
+        with connection.cursor() as c:
+            for _ in range(9100):   # 超过 CaptureQueriesContext 的 9000 条上限
+                c.execute("SELECT 1")
+        return "done"
+
+    m = measure(many, 1)
+    assert (m["queries"], m["result"]) == (9100, "done")
+
+
+def test_bench_measure_peak_rss_per_operation():
+    from jobs.bench import measure, reset_peak_rss
+
+    if not reset_peak_rss():
+        pytest.skip("平台不支持重置 RSS 峰值")
+    big = measure(lambda: len(bytearray(200 * 1024 * 1024)), 1)
+    small = measure(lambda: 0, 1)
+    assert big["peak_rss_mb"] - small["peak_rss_mb"] > 150   # 第二次不继承第一次的峰值
+
+
+@pytest.mark.django_db
+def test_bench_synthetic_rows_and_command(media, tmp_path):
+    from django.core.management import call_command
+    from jobs.bench import synthetic_rows
+
+    rows = list(synthetic_rows(1000, dup_ratio=0.1, invalid_ratio=0.02, seed=1))
+    assert len(rows) == 1000
+    assert rows == list(synthetic_rows(1000, dup_ratio=0.1, invalid_ratio=0.02, seed=1))  # 可复现
+
+    out = tmp_path / "bench.json"
+    call_command("bench_courses", sizes="500", formats="csv", output=str(out))
+    report = json.loads(out.read_text(encoding="utf-8"))
+    assert [r["op"] for r in report["results"]] == ["import", "reimport", "export"]
+    assert report["results"][0]["ok"] == 500
+    assert all(r["queries"] > 0 for r in report["results"])
+    assert not Course.objects.filter(code__startswith="BENCH").exists()
@@ -0,0 +1,78 @@
+import pytest
+from rest_framework.test import APIClient
+
+from conftest import login
+from jobs.models import Job
+from jobs.registry import _on_postrun, _on_prerun, dispatch
+from jobs.tasks import export_courses_task, import_courses_task
+
+
+@pytest.mark.django_db
+def test_job_lifecycle_from_signals(users, monkeypatch):
+    sent = []
+    monkeypatch.setattr(import_courses_task, "apply_async", lambda *a, **kw: sent.append(kw["task_id"]))
+
+    job = dispatch(import_courses_task, ("imports/x.csv",), kind=Job.KIND_IMPORT, user=users["r"],
+                   params={"source": "imports/x.csv", "shards": 1})
+    assert sent == [job.task_id] and job.status == "pending"
+
+    _on_prerun(task_id=job.task_id, task=import_courses_task)
+    _on_postrun(task_id=job.task_id, task=import_courses_task, state="SUCCESS",
+                retval={"status": "success", "ok": 90, "fail": 10, "errors": []})
+    job.refresh_from_db()
+    assert (job.status, job.ok, job.fail, job.rows) == ("success", 90, 10, 100)
+    assert job.duration_seconds is not None
+
+
+@pytest.mark.django_db
+def test_dispatch_failure_removes_job(users, monkeypatch):
+    def boom(*a, **kw):
+        raise ConnectionError("broker down")
+    monkeypatch.setattr(export_courses_task, "apply_async", boom)
+
+    with pytest.raises(ConnectionError):
+        dispatch(export_courses_task, ({}, "csv"), kind=Job.KIND_EXPORT, user=users["m"], params={})
+    assert not Job.objects.exists()
+
+
+@pytest.mark.django_db
+def test_job_list_and_batch_status(api: APIClient, users):
+    mine = Job.objects.create(task_id="t-1", kind="export", user=users["t"], status="success",
+                              rows=5, artifact="/media/exports/a.csv")
+    Job.objects.create(task_id="t-2", kind="import", user=users["m"], status="failure", error="boom")
+
+    login(api, "t1")
+    r = api.get("/api/jobs")
+    assert r.status_code == 200
+    assert [j["task_id"] for j in r.data["results"]] == ["t-1"]  # 只看自己的
+
+    r = api.get("/api/tasks?ids=t-1,t-2")
+    assert r.status_code == 200
+    assert r.data["t-1"]["result"]["download_url"].startswith("http://")
+    assert r.data["t-1"]["result"]["count"] == 5
+    assert r.data["t-2"] == {"state": "PENDING"}             # 别人的任务不可见
+    assert api.get("/api/tasks/t-2").data == {"state": "PENDING"}
+
+    api_m = APIClient()
+    login(api_m, "m1")
+    assert api_m.get("/api/tasks?ids=t-2").data["t-2"] == {"state": "FAILURE", "error": "boom"}
+    r = api_m.get("/api/jobs?kind=import")
+    assert [j["task_id"] for j in r.data["results"]] == ["t-2"]
+    assert mine.rows_per_second is None
+
+
+@pytest.mark.django_db
+def test_batch_status_returns_stored_result(api: APIClient, users):
+    result = {"status": "success", "download_url": "/media/exports/b.jsonl", "count": 3, "format": "jsonl",
+              "since": "2026-10-01T00:00:00+00:00", "watermark": "2026-10-02T00:00:00+00:00"}
+    job = Job.objects.create(task_id="t-3", kind="export", user=users["t"])
+    _on_postrun(task_id=job.task_id, task=export_courses_task, state="SUCCESS", retval=result)
+    imp = Job.objects.create(task_id="t-4", kind="import", user=users["t"])
+    errors = [{"line": 2, "code": "", "error": "code/title 不能为空"}]
+    _on_postrun(task_id=imp.task_id, task=import_courses_task, state="SUCCESS",
+                retval={"status": "success", "ok": 1, "fail": 1, "errors": errors})
+
+    login(api, "t1")
+    r = api.get("/api/tasks?ids=t-3,t-4")
+    assert r.data["t-3"]["result"] == {**result, "download_url": "http://testserver/media/exports/b.jsonl"}
+    assert r.data["t-4"]["result"]["errors"] == errors
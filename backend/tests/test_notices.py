@@ -0,0 +1,479 @@
+import pytest
+
+from conftest import login
+
+from notices.fanout import fanout
+from notices.models import Announcement, Delivery
+from users.models import User
+
+
+@pytest.mark.django_db
+def test_fanout_is_set_based_and_idempotent(users, django_assert_max_num_queries):
+    User.objects.bulk_create([User(username=f"stu{i}", role="student") for i in range(50)])
+    a = Announcement.objects.create(title="t", body="b", publisher=users["t"])
+
+    # 每批固定条数（状态检查、取批边界、INSERT 投递、累加未读数与统计、检查点，外加 SAVEPOINT/RELEASE），
+    # 与每批人数无关
+    with django_assert_max_num_queries(10 + (51 // 10 + 1) * 9):
+        assert fanout(a.id, batch_size=10) == 51
+    assert Delivery.objects.filter(announcement=a, state="queued").count() == 51
+    assert not Delivery.objects.filter(announcement=a, user=users["t"]).exists()
+
+    # 重跑只补新学生
+    User.objects.create(username="late", role="student")
+    assert fanout(a.id, batch_size=10) == 1
+
+
+@pytest.mark.django_db
+def test_pull_mode_inbox_without_deliveries(api, users, settings):
+    settings.NOTICES_BROADCAST_MODE = "pull"
+    login(api, "t1")
+    res = api.post("/api/announcements/", {"title": "停课通知", "body": "..."}, format="json")
+    assert res.status_code == 201
+    aid = res.data["id"]
+    assert not Delivery.objects.filter(announcement_id=aid).exists()   # 发布不写投递
+
+    login(api, "s1")
+    rows = api.get("/api/deliveries/?state=pending").data["results"]
+    assert [(r["announcement"], r["id"], r["state"]) for r in rows] == [(aid, None, "queued")]
+    assert not Delivery.objects.filter(announcement_id=aid).exists()   # 读收件箱不落行
+    assert api.get("/api/unread_count").data["unread"] == 1
+
+    assert api.post(f"/api/announcements/{aid}/ack/").status_code == 200
+    d = Delivery.objects.get(announcement_id=aid)                       # 确认时才落行，位置不变
+    assert d.state == "acknowledged" and d.created_at == Announcement.objects.get(pk=aid).created_at
+    assert api.get("/api/deliveries/?state=pending").data["results"] == []
+    assert api.get("/api/unread_count").data["unread"] == 0
+
+    login(api, "t1")
+    stats = api.get(f"/api/announcements/{aid}/stats/").data
+    assert (stats["total"], stats["ack_count"]) == (1, 1)
+    assert api.post(f"/api/announcements/{aid}/ack/").status_code == 403   # 教师不在受众内
+
+    # 同一收件箱里混有 push 公告
+    push = Announcement.objects.create(title="p", body="b", publisher=users["t"], fanout_mode="push")
+    fanout(push.id)
+    login(api, "s1")
+    rows = api.get("/api/deliveries/?state=pending").data["results"]
+    assert [(r["announcement"], r["id"]) for r in rows] == [(push.id, Delivery.objects.get(announcement=push).id)]
+
+
+@pytest.mark.django_db
+def test_unread_counter_maintained_and_reconciled(api, users, django_assert_max_num_queries):
+    from notices.counters import reconcile
+    from notices.models import UnreadCounter
+
+    a1 = Announcement.objects.create(title="a1", body="b", publisher=users["t"], fanout_mode="push")
+    a2 = Announcement.objects.create(title="a2", body="b", publisher=users["t"], fanout_mode="push")
+    fanout(a1.id); fanout(a2.id); fanout(a2.id)   # 重跑不重复计数
+    assert UnreadCounter.objects.get(user=users["s"]).unread == 2
+
+    login(api, "s1")
+    with django_assert_max_num_queries(4):   # 鉴权取用户 + 计数器 + pull 公告计数
+        assert api.get("/api/unread_count").data["unread"] == 2
+    d1 = Delivery.objects.get(announcement=a1, user=users["s"])
+    api.post(f"/api/deliveries/{d1.id}/ack/"); api.post(f"/api/deliveries/{d1.id}/ack/")
+    assert api.get("/api/unread_count").data["unread"] == 1
+
+    login(api, "t1")
+    api.post(f"/api/announcements/{a2.id}/withdraw/"); api.post(f"/api/announcements/{a2.id}/withdraw/")
+    assert UnreadCounter.objects.get(user=users["s"]).unread == 0
+
+    UnreadCounter.objects.filter(user=users["s"]).update(unread=7)   # 人为漂移
+    assert reconcile() == 1
+    assert UnreadCounter.objects.get(user=users["s"]).unread == 0
+
+
+@pytest.mark.django_db
+def test_materialized_stats_and_list_with_stats(api, users, django_assert_max_num_queries):
+    from notices.counters import reconcile_stats
+
+    User.objects.bulk_create([User(username=f"stu{i}", role="student") for i in range(3)])
+    ann = [Announcement.objects.create(title=f"a{i}", body="b", publisher=users["t"], fanout_mode="push")
+           for i in range(3)]
+    for a in ann:
+        fanout(a.id)
+
+    login(api, "s1")
+    d = Delivery.objects.get(announcement=ann[0], user=users["s"])
+    api.post(f"/api/deliveries/{d.id}/delivered/")
+    api.post(f"/api/deliveries/{d.id}/ack/")
+    api.post(f"/api/announcements/{ann[1].id}/ack/")   # 未展示直接确认
+
+    login(api, "t1")
+    with django_assert_max_num_queries(3):   # 鉴权取用户 + 一页公告（含发布者），与公告数无关
+        rows = api.get("/api/announcements/?mine=1&with_stats=1").data["results"]
+    stats = {r["id"]: (r["stats"]["total"], r["stats"]["delivered_count"], r["stats"]["ack_count"]) for r in rows}
+    assert stats == {ann[0].id: (4, 1, 1), ann[1].id: (4, 1, 1), ann[2].id: (4, 0, 0)}
+    assert api.get(f"/api/announcements/{ann[0].id}/stats/").data["ack_rate"] == 0.25
+    assert reconcile_stats() == 0
+
+
+@pytest.mark.django_db
+def test_remind_batches_over_one_connection_with_cooldown(users, settings, mailoutbox):
+    from notices.reminders import remind
+
+    settings.NOTICES_REMIND_RATE = 0
+    User.objects.bulk_create([User(username=f"stu{i}", role="student", email=f"stu{i}@local") for i in range(5)])
+    push = Announcement.objects.create(title="交作业", body="b", publisher=users["t"], fanout_mode="push")
+    pull = Announcement.objects.create(title="停课", body="b", publisher=users["t"], fanout_mode="pull")
+    fanout(push.id)
+    Delivery.objects.filter(announcement=push, user=users["s"]).update(state="acknowledged")
+
+    assert remind(push, batch_size=2) == {"reminded": 5, "sent": 5}
+    assert remind(pull, batch_size=2) == {"reminded": 6, "sent": 6}
+    assert len(mailoutbox) == 11
+    assert Delivery.objects.filter(announcement=pull, retry_count=1).count() == 6   # pull 接收者补了投递行
+
+    assert remind(push) == {"reminded": 0, "sent": 0}   # 冷却期内不重复提醒
+    settings.NOTICES_REMIND_COOLDOWN = 0
+    assert remind(push)["reminded"] == 5
+
+
+@pytest.mark.django_db
+def test_remind_task_reschedules_per_batch_and_claims_before_send(users, settings, mailoutbox, monkeypatch):
+    from celery.canvas import Signature
+    from notices import reminders
+    from notices.tasks import remind_unacked_task
+
+    User.objects.bulk_create([User(username=f"stu{i}", role="student", email=f"stu{i}@local") for i in range(4)])
+    a = Announcement.objects.create(title="交作业", body="b", publisher=users["t"], fanout_mode="push")
+    fanout(a.id)
+
+    # 发信失败：本批已认领，重跑不会再发给他们
+    monkeypatch.setattr(reminders, "send_mass_mail", lambda *a, **kw: (_ for _ in ()).throw(OSError("smtp down")))
+    with pytest.raises(OSError):
+        reminders.remind_batch(a, batch_size=2)
+    assert Delivery.objects.filter(announcement=a, last_push_at__isnull=False).count() == 2
+    monkeypatch.undo()
+
+    settings.NOTICES_REMIND_RATE = 2
+    monkeypatch.setattr(reminders, "REMIND_BATCH_SIZE", 2)
+    # 一批一个任务：还有剩余就 replace 成下一批，countdown 按限速折算，累计结果沿链传下去
+    monkeypatch.setattr(remind_unacked_task, "replace", lambda sig: sig)
+    res, countdowns = remind_unacked_task(a.id), []
+    while isinstance(res, Signature):   # Signature 也是 dict
+        countdowns.append(res.options["countdown"])
+        res = remind_unacked_task(*res.args)
+    assert res == {"reminded": 3, "sent": 3} and countdowns == [1.0]
+    assert len(mailoutbox) == 3
+
+
+@pytest.mark.django_db
+def test_inbox_cursor_pagination(api, users):
+    ann = [Announcement.objects.create(title=f"a{i}", body="b", publisher=users["t"], fanout_mode="push")
+           for i in range(5)]
+    for a in ann:
+        fanout(a.id)
+
+    login(api, "s1")
+    seen, url = [], "/api/deliveries/?page_size=2"
+    while url:
+        page = api.get(url).data
+        assert len(page["results"]) <= 2
+        seen += [r["announcement"] for r in page["results"]]
+        url = page["next"]
+    assert seen == [a.id for a in reversed(ann)]
+
+
+@pytest.mark.django_db
+def test_inbox_merges_push_and_pull_without_writes(api, users, mailoutbox, settings):
+    from datetime import timedelta
+    from django.utils import timezone
+    from notices.reminders import remind
+
+    settings.NOTICES_REMIND_COOLDOWN = 0
+    now = timezone.now()
+    User.objects.filter(role="student").update(date_joined=now - timedelta(days=1))
+    anns, at = [], {}
+    for i, mode in enumerate(["pull", "push", "pull", "push", "pull"]):
+        a = Announcement.objects.create(title=f"a{i}", body="b", publisher=users["t"], fanout_mode=mode)
+        at[a.id] = now - timedelta(minutes=10 - i)
+        Announcement.objects.filter(pk=a.pk).update(created_at=at[a.id])
+        if mode == "push":
+            fanout(a.id)
+            Delivery.objects.filter(announcement=a).update(created_at=at[a.id])
+        anns.append(a)
+    expected = [a.id for a in reversed(anns)]
+
+    login(api, "s1")
+    before = Delivery.objects.count()
+    for compact in ("0", "1"):
+        seen, url = [], f"/api/deliveries/?page_size=2&compact={compact}"
+        while url:
+            page = api.get(url).data
+            assert len(page["results"]) <= 2
+            seen += [r["announcement"] for r in page["results"]]
+            url = page["next"]
+        assert seen == expected
+    assert Delivery.objects.count() == before                  # 翻页不写库
+    assert api.get("/api/deliveries/?cursor=bogus").status_code == 404
+
+    # 老的 pull 公告被确认或提醒后落行，在收件箱里的位置不变
+    assert api.post(f"/api/announcements/{anns[0].id}/ack/").status_code == 200
+    remind(Announcement.objects.get(pk=anns[2].id))
+    for a in (anns[0], anns[2]):
+        assert Delivery.objects.get(announcement=a, user=users["s"]).created_at == at[a.id]
+    assert [r["announcement"] for r in api.get("/api/deliveries/").data["results"]] == expected
+
+
+@pytest.mark.django_db
+def test_bulk_ack_all_pending(api, users, settings, django_assert_max_num_queries):
+    from notices.models import UnreadCounter
+
+    push = [Announcement.objects.create(title=f"p{i}", body="b", publisher=users["t"], fanout_mode="push")
+            for i in range(3)]
+    for a in push:
+        fanout(a.id)
+    pull = Announcement.objects.create(title="pull", body="b", publisher=users["t"], fanout_mode="pull")
+
+    login(api, "s1")
+    d0 = Delivery.objects.get(announcement=push[0], user=users["s"])
+    assert api.post("/api/deliveries/bulk_delivered/", {"ids": [d0.id]}, format="json").data == {"updated": 1}
+    assert api.post("/api/deliveries/bulk_ack/", {"ids": "x"}, format="json").status_code == 400
+    assert api.get("/api/unread_count").data["unread"] == 4
+
+    with django_assert_max_num_queries(14):   # 与投递条数无关
+        res = api.post("/api/deliveries/bulk_ack/", {"all": True}, format="json")
+    assert res.data == {"updated": 4}
+    assert api.get("/api/unread_count").data["unread"] == 0
+    assert UnreadCounter.objects.get(user=users["s"]).unread == 0
+    assert api.post("/api/deliveries/bulk_ack/", {"all": True}, format="json").data == {"updated": 0}
+
+    counts = {a.id: (a.delivered_count, a.ack_count) for a in Announcement.objects.all()}
+    assert counts == {**{a.id: (1, 1) for a in push}, pull.id: (1, 1)}
+
+
+@pytest.mark.django_db
+def test_targeted_audience_deduplicates_overlaps(api, users, monkeypatch):
+    from classes.models import ClassSection
+    from catalog.models import Course
+    from notices.tasks import fanout_all_students, fanout_announcement
+
+    queued = []
+    monkeypatch.setattr(fanout_announcement, "delay", lambda aid: queued.append(aid))
+    cs = [User.objects.create(username=f"cs{i}", role="student", department="CS") for i in range(3)]
+    User.objects.create(username="ee0", role="student", department="EE")
+    sec = ClassSection.objects.create(course=Course.objects.create(code="C1", title="c"), section_code="1",
+                                      term="2025", teacher=users["t"])
+
+    login(api, "t1")
+    bad = api.post("/api/announcements/", {"title": "x", "body": "b", "audience": "targeted",
+                                           "targets": {"roles": ["admin"]}}, format="json")
+    assert bad.status_code == 400
+    # 班级没有选课名单，按班级定向直接拒绝
+    bad = api.post("/api/announcements/", {"title": "x", "body": "b", "audience": "targeted",
+                                           "targets": {"sections": [sec.id]}}, format="json")
+    assert bad.status_code == 400 and "班级" in str(bad.data["targets"])
+    res = api.post("/api/announcements/", {
+        "title": "实验课调整", "body": "b", "audience": "targeted",
+        "targets": {"departments": ["CS"], "users": [cs[0].id, users["s"].id], "roles": ["registrar"]},
+    }, format="json")
+    assert res.status_code == 201 and res.data["fanout_mode"] == "push"
+    assert queued == [res.data["id"]]
+
+    assert fanout(res.data["id"]) == 5   # 3 名 CS 学生 + s1 + registrar，cs0 只一条
+    got = set(Delivery.objects.filter(announcement_id=res.data["id"]).values_list("user__username", flat=True))
+    assert got == {"cs0", "cs1", "cs2", "s1", "r1"}
+
+    fanout_all_students(res.data["id"])   # 旧任务名只是转投
+    assert queued == [res.data["id"]] * 2
+
+
+@pytest.mark.django_db
+def test_fanout_task_announces_only_new_deliveries(users, monkeypatch):
+    from notices import events
+    from notices.tasks import fanout_announcement
+
+    sent = []
+    monkeypatch.setattr(events, "announce", lambda a, kind="announcement": sent.append((a.id, kind)))
+    a = Announcement.objects.create(title="t", body="b", publisher=users["t"], fanout_mode="push")
+    assert fanout_announcement(a.id) == {"ok": 1}
+    assert fanout_announcement(a.id) == {"ok": 0}   # 重跑没有新投递，不再广播
+    assert sent == [(a.id, "announcement")]
+
+
+@pytest.mark.django_db
+def test_scheduled_publish_fans_out_once(api, users, monkeypatch, django_capture_on_commit_callbacks):
+    from datetime import timedelta
+    from django.utils import timezone
+    from notices.tasks import fanout_announcement, publish_due_announcements
+
+    queued = []
+    monkeypatch.setattr(fanout_announcement, "delay", lambda aid: queued.append(aid))
+    login(api, "t1")
+    later = (timezone.now() + timedelta(hours=1)).isoformat()
+    res = api.post("/api/announcements/", {"title": "期末安排", "body": "b", "publish_at": later}, format="json")
+    assert res.data["status"] == "draft" and queued == []
+
+    login(api, "s1")
+    assert api.get("/api/announcements/").data["results"] == []   # 草稿学生不可见
+
+    with django_capture_on_commit_callbacks(execute=True):
+        assert publish_due_announcements() == {"published": 0}
+    Announcement.objects.filter(pk=res.data["id"]).update(publish_at=timezone.now())
+    with django_capture_on_commit_callbacks(execute=True):
+        assert publish_due_announcements() == {"published": 1}
+        assert publish_due_announcements() == {"published": 0}
+    assert queued == [res.data["id"]]
+    assert Announcement.objects.get(pk=res.data["id"]).status == "published"
+
+
+@pytest.mark.django_db(transaction=True)
+def test_notice_event_stream_filters_by_audience(users, monkeypatch):
+    import asyncio
+    from notices import realtime
+    from notices.events import BROADCAST, user_channel
+
+    async def no_redis(self):
+        return None
+    monkeypatch.setattr(realtime._Hub, "_run", no_redis)
+    monkeypatch.setattr(realtime, "UNREAD_DEBOUNCE_SECONDS", 0)
+    queries = []
+    monkeypatch.setattr(realtime.counters, "unread_for", lambda u: queries.append(u.id) or 0)
+
+    async def scenario():
+        hub = realtime._Hub()
+        s_stream, t_stream = realtime._events(users["s"], hub), realtime._events(users["t"], hub)
+        for st in (s_stream, t_stream):
+            assert await anext(st) == "retry: 3000\n\n"
+            assert await anext(st) == 'event: unread\ndata: {"unread": 0}\n\n'
+
+        hub.dispatch(BROADCAST, {"type": "announcement", "id": 1, "title": "教师会", "match": {"roles": ["teacher"]}})
+        hub.dispatch(BROADCAST, {"type": "announcement", "id": 2, "title": "停课", "unread_delta": 1,
+                                 "match": {"roles": ["student"]}})
+        assert (await anext(s_stream) == 'event: announcement\n'
+                'data: {"type": "announcement", "id": 2, "title": "停课", "unread_delta": 1}\n\n')
+        assert '"id": 1' in await anext(t_stream)
+        assert len(queries) == 2                                   # 广播不触发未读数重算
+
+        for _ in range(3):                                         # 连续的状态变化合并成一次
+            hub.dispatch(user_channel(users["s"].id), {"type": "changed"})
+        assert (await anext(s_stream)).startswith("event: unread")
+        assert queries[2:] == [users["s"].id]
+        await s_stream.aclose(); await t_stream.aclose()
+        assert not hub._queues
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.django_db
+def test_fanout_resumes_from_checkpoint_and_stops_on_withdraw(users, monkeypatch):
+    from notices import counters
+    from notices.models import FanoutCheckpoint
+
+    User.objects.bulk_create([User(username=f"stu{i}", role="student") for i in range(9)])   # 共 10 名学生
+    a = Announcement.objects.create(title="t", body="b", publisher=users["t"], fanout_mode="push")
+
+    real, calls = counters.add_stats, []
+    def flaky(*args, **kw):
+        calls.append(1)
+        if len(calls) == 2:
+            raise ConnectionError("db went away")
+        return real(*args, **kw)
+    monkeypatch.setattr(counters, "add_stats", flaky)
+    with pytest.raises(ConnectionError):
+        fanout(a.id, batch_size=4)
+    cp = FanoutCheckpoint.objects.get(announcement=a)
+    assert (cp.inserted, cp.done) == (4, False)          # 第二批整体回滚，检查点停在第一批
+    assert Delivery.objects.filter(announcement=a).count() == 4
+
+    assert fanout(a.id, batch_size=4) == 6               # 重试只做剩下的
+    cp.refresh_from_db()
+    assert cp.done and Announcement.objects.get(pk=a.id).total_count == 10
+
+    b = Announcement.objects.create(title="t2", body="b", publisher=users["t"], fanout_mode="push",
+                                    status="withdrawn")
+    assert fanout(b.id) == 0 and not Delivery.objects.filter(announcement=b).exists()
+
+
+@pytest.mark.django_db
+def test_withdraw_during_fanout_keeps_counters_exact(api, users, monkeypatch):
+    from notices import counters, fanout as fanout_mod
+
+    User.objects.bulk_create([User(username=f"stu{i}", role="student") for i in range(9)])   # 共 10 名学生
+    a = Announcement.objects.create(title="t", body="b", publisher=users["t"], fanout_mode="push")
+    login(api, "t1")
+
+    real = counters.bump_inserted
+    def bump_then_withdraw(*args, **kw):
+        # 第一批插入后、提交前撤回：撤回要等这一批落定才扣未读，后续批次不再插入
+        real(*args, **kw)
+        monkeypatch.setattr(counters, "bump_inserted", real)
+        assert api.post(f"/api/announcements/{a.id}/withdraw/").status_code == 200
+    monkeypatch.setattr(counters, "bump_inserted", bump_then_withdraw)
+
+    assert fanout_mod.fanout(a.id, batch_size=4) == 4
+    assert Delivery.objects.filter(announcement=a).count() == 4
+    assert counters.reconcile() == 0
+
+
+@pytest.mark.django_db
+def test_archive_moves_cold_deliveries(api, users, settings):
+    from datetime import timedelta
+    from django.utils import timezone
+    from notices import counters
+    from notices.archive import archive
+    from notices.models import DeliveryArchive
+
+    settings.NOTICES_ARCHIVE_AFTER_DAYS = 30
+    User.objects.create(username="s2", role="student")
+    old = Announcement.objects.create(title="old", body="b", publisher=users["t"], fanout_mode="push")
+    gone = Announcement.objects.create(title="gone", body="b", publisher=users["t"], fanout_mode="push")
+    fanout(old.id); fanout(gone.id)
+    login(api, "s1")
+    assert api.post(f"/api/announcements/{old.id}/ack/").status_code == 200
+    Delivery.objects.filter(announcement=old).update(created_at=timezone.now() - timedelta(days=31))
+    Announcement.objects.filter(pk=gone.id).update(status="withdrawn")
+
+    assert archive(batch_size=1) == 3   # old 已确认的 1 条 + gone 的 2 条；s2 未确认的留在热表
+    assert list(Delivery.objects.values_list("announcement_id", "user__username")) == [(old.id, "s2")]
+    rows = api.get("/api/deliveries/?archived=1").data["results"]
+    assert [(r["announcement"], r["state"]) for r in rows] == [(old.id, "acknowledged")]   # 撤回的不显示
+    assert api.get("/api/deliveries/").data["results"] == []
+
+    # 统计是物化的，按投递表 + 归档表重算也不变；重跑 fanout 不会给已归档的人补投递
+    assert counters.reconcile_stats() == 0
+    assert fanout(old.id) == 0
+    assert DeliveryArchive.objects.count() == 3 and archive() == 0
+
+
+@pytest.mark.django_db
+def test_targeted_announcement_visible_after_archive(api, users, settings):
+    from datetime import timedelta
+    from django.utils import timezone
+    from notices.archive import archive
+
+    settings.NOTICES_ARCHIVE_AFTER_DAYS = 30
+    a = Announcement.objects.create(title="t", body="b", publisher=users["t"], fanout_mode="push",
+                                    audience=Announcement.AUD_TARGETED, targets={"users": [users["s"].id]})
+    fanout(a.id)
+    login(api, "s1")
+    assert api.post(f"/api/announcements/{a.id}/ack/").status_code == 200
+    Delivery.objects.filter(announcement=a).update(created_at=timezone.now() - timedelta(days=31))
+    assert archive() == 1
+
+    assert api.get(f"/api/announcements/{a.id}/").status_code == 200
+    assert a.id in [r["id"] for r in api.get("/api/announcements/").data["results"]]
+    User.objects.create_user(username="s2", password="123456.Aa!", role="student")
+    login(api, "s2")   # 不在受众里
+
+    assert api.get(f"/api/announcements/{a.id}/").status_code == 404
+
+
+@pytest.mark.django_db
+def test_compact_inbox_truncates_bodies(api, users, django_assert_max_num_queries):
+    from notices.inbox import SUMMARY_LENGTH
+
+    long = Announcement.objects.create(title="长", body="字" * 5000, publisher=users["t"], fanout_mode="push")
+    short = Announcement.objects.create(title="短", body="b", publisher=users["t"], fanout_mode="push")
+    fanout(long.id); fanout(short.id)
+    login(api, "s1")
+    with django_assert_max_num_queries(5):   # 认证用户 + 投递一页 + pull 公告一页 + 发布者表
+        data = api.get("/api/deliveries/?compact=1").data
+    rows = {r["announcement"]: r for r in data["results"]}
+    assert rows[long.id]["summary"] == "字" * SUMMARY_LENGTH and rows[long.id]["truncated"]
+    assert rows[short.id]["summary"] == "b" and not rows[short.id]["truncated"]
+    assert "announcement_body" not in rows[short.id]
+    assert data["publishers"] == {users["t"].id: "t1"}
+    assert rows[long.id]["id"] == Delivery.objects.get(announcement=long).id
@@ -0,0 +1,103 @@
+import asyncio
+import json
+
+import pytest
+from rest_framework.test import APIClient
+
+from conftest import login
+
+
+class FakePubSub:
+    """按顺序吐出预置消息的假订阅（redis.asyncio 接口）。"""
+
+    def __init__(self, messages):
+        self.messages = list(messages)
+        self.channels = []
+        self.closed = False
+
+    async def subscribe(self, *channels):
+        self.channels.extend(channels)
+
+    async def get_message(self, timeout=None):
+        if not self.messages:
+            return None
+        return {"type": "message", "data": json.dumps(self.messages.pop(0)).encode()}
+
+    async def aclose(self):
+        self.closed = True
+
+
+class FakeRedis:
+    def __init__(self, pubsub):
+        self._pubsub = pubsub
+
+    def pubsub(self, **kwargs):
+        return self._pubsub
+
+    async def aclose(self):
+        pass
+
+
+async def _collect(stream):
+    body = b"".join([chunk async for chunk in stream]).decode()
+    return [json.loads(line[6:]) for line in body.splitlines() if line.startswith("data: ")]
+
+
+@pytest.mark.django_db
+def test_task_events_stream(api: APIClient, users, monkeypatch):
+    snapshots = {
+        "a": {"state": "PROGRESS", "meta": {"ok": 1, "fail": 0}},
+        "b": {"state": "PROGRESS", "meta": {"ok": 0, "fail": 0, "shards": ["s1", "s2"]}},
+    }
+    monkeypatch.setattr("jobs.views.task_payload", lambda tid, absolutize: snapshots[tid])
+    monkeypatch.setattr("jobs.views._shard_snapshot", lambda ids: {sid: ("PENDING", None) for sid in ids})
+    pubsub = FakePubSub([
+        {"id": "s1", "state": "PROGRESS", "meta": {"ok": 5, "fail": 1}},
+        {"id": "a", "state": "SUCCESS", "result": {"download_url": "/media/exports/x.csv"}},
+        {"id": "s2", "state": "SUCCESS", "result": {"ok": 3, "fail": 0}},
+        {"id": "b", "state": "SUCCESS", "result": {"ok": 8, "fail": 1}},
+    ])
+    monkeypatch.setattr("jobs.views.get_async_redis", lambda: FakeRedis(pubsub))
+
+    login(api, "m1")
+    resp = api.get("/api/tasks/events?ids=a,b", HTTP_ACCEPT="text/event-stream")
+    assert resp.status_code == 200
+    assert resp["Content-Type"].startswith("text/event-stream")
+
+    events = asyncio.run(_collect(resp.streaming_content))
+    assert [e["id"] for e in events] == ["a", "b", "b", "a", "b", "b"]
+    assert events[2]["meta"]["ok"] == 5                       # 分片进度合并到父任务
+    assert events[3]["result"]["download_url"].startswith("http://")
+    assert events[4]["meta"]["ok"] == 8 and events[4]["meta"]["shards_done"] == 1
+    assert "task-progress:s1" in pubsub.channels and pubsub.closed
+
+
+@pytest.mark.django_db
+def test_task_events_hides_other_users_jobs(api: APIClient, users, monkeypatch):
+    from jobs.models import Job
+
+    Job.objects.create(task_id="theirs", kind="export", user=users["m"], status="success")
+    monkeypatch.setattr("jobs.views.task_payload", lambda tid, absolutize: {"state": "SUCCESS", "result": {}})
+    pubsub = FakePubSub([])
+    monkeypatch.setattr("jobs.views.get_async_redis", lambda: FakeRedis(pubsub))
+
+    login(api, "t1")
+    resp = api.get("/api/tasks/events?ids=theirs")
+    assert asyncio.run(_collect(resp.streaming_content)) == [{"id": "theirs", "state": "PENDING"}]
+    assert pubsub.channels == []
+
+
+@pytest.mark.django_db
+def test_task_events_requires_ids(api: APIClient, users):
+    assert api.get("/api/tasks/events?ids=a").status_code == 401
+    login(api, "m1")
+    assert api.get("/api/tasks/events").status_code == 400
+
+
+@pytest.mark.django_db
+def test_task_events_accepts_query_token(api: APIClient, users, monkeypatch):
+    # EventSource 不能带请求头，token 走查询参数
+    monkeypatch.setattr("jobs.views.get_async_redis", lambda: FakeRedis(FakePubSub([])))
+    token = api.post("/auth/login", {"username": "m1", "password": "123456.Aa!"}, format="json").data["access"]
+    assert APIClient().get(f"/api/tasks/events?ids=a&token={token}").status_code == 200
+    assert APIClient().get("/api/tasks/events?ids=a&token=bogus").status_code == 401
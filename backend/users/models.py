@@ -5,4 +5,8 @@ class User(AbstractUser):
     role = models.CharField(max_length=16, choices=[
         ('manager','manager'),('registrar','registrar'),
         ('teacher','teacher'),('student','student')
-    ], default='student')
\ No newline at end of file
+    ], default='student')
+
+    class Meta(AbstractUser.Meta):
+        # 公告受众解析按角色/院系筛选用户
+        indexes = [models.Index(fields=["role"]), models.Index(fields=["department"])]
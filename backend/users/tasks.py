@@ -0,0 +1,10 @@
+from celery import shared_task
+from django.conf import settings
+from django.core.mail import send_mail
+
+
+@shared_task(autoretry_for=(Exception,), retry_backoff=10, max_retries=3)
+def send_email_task(subject: str, message: str, recipient_list: list):
+    """账号相关邮件改为异步发送，请求不再等待 SMTP。"""
+    return send_mail(subject=subject, message=message, from_email=settings.DEFAULT_FROM_EMAIL,
+                     recipient_list=recipient_list)
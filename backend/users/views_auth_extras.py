@@ -1,8 +1,9 @@
+import logging
+
 from django.contrib.auth import get_user_model
 from django.contrib.auth.tokens import PasswordResetTokenGenerator
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.utils.encoding import force_bytes, force_str
-from django.core.mail import send_mail
 from django.conf import settings
 from rest_framework.views import APIView
 from rest_framework.response import Response
@@ -12,6 +13,7 @@ from rest_framework import status, permissions
 from rest_framework import generics, permissions
 from .models import User
 from .serializers import UserSerializer
+from .tasks import send_email_task
 
 from .serializers import (
     RegisterSerializer, ForgotUsernameSerializer,
@@ -20,6 +22,15 @@ from .serializers import (
 
 User = get_user_model()
 token_gen = PasswordResetTokenGenerator()
+logger = logging.getLogger(__name__)
+
+
+def _send_email(subject: str, message: str, recipient_list: list):
+    """投递发信任务；broker 不可用时只记日志，接口照常返回（与原先 fail_silently 的行为一致）。"""
+    try:
+        send_email_task.delay(subject, message, recipient_list)
+    except Exception:
+        logger.warning("enqueue account email failed: %s", subject, exc_info=True)
 
 # 注册
 class RegisterView(APIView):
@@ -43,13 +54,7 @@ class ForgotUsernameView(APIView):
             # 为避免枚举邮箱，统一返回成功
             return Response({"detail":"若邮箱存在，我们已发送邮件"}, status=200)
         usernames = ", ".join(u.username for u in users)
-        send_mail(
-            subject="你的账号用户名",
-            message=f"与此邮箱关联的用户名：{usernames}",
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[email],
-            fail_silently=True,
-        )
+        _send_email("你的账号用户名", f"与此邮箱关联的用户名：{usernames}", [email])
         return Response({"detail":"邮件已发送"}, status=200)
 
 # 忘记密码：申请邮件
@@ -66,13 +71,7 @@ class ForgotPasswordRequestView(APIView):
             token = token_gen.make_token(user)
             # 前端的重置页面：/reset-password?uid=...&token=...
             link = f"{settings.SITE_URL}/reset-password?uid={uid}&token={token}"
-            send_mail(
-                subject="重置你的密码",
-                message=f"点击链接重置密码（30分钟内有效）：{link}",
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[email],
-                fail_silently=True,
-            )
+            _send_email("重置你的密码", f"点击链接重置密码（30分钟内有效）：{link}", [email])
         return Response({"detail":"若邮箱存在，我们已发送重置邮件"}, status=200)
 
 # 真正重置密码
@@ -9,7 +9,7 @@ type Me = {
 };
 
 type Delivery = {
-  id: number;
+  id: number | null; // 投递 id；pull 公告在标记/确认前没有投递行，收件箱里为 null（操作一律按 announcement）
   announcement: number;
   announcement_title: string;
   announcement_body: string;
@@ -27,6 +27,7 @@ type Announcement = {
   body: string;
   status: "draft" | "published" | "withdrawn";
   created_at: string;
+  stats?: { total: number; delivered_count: number; ack_count: number; ack_rate: number };
 };
 
 export default function MessagesPage() {
@@ -105,14 +106,22 @@ export default function MessagesPage() {
 
 function Inbox() {
   const [list, setList] = useState<Delivery[]>([]);
+  const [next, setNext] = useState<string | null>(null);
   const [loading, setLoading] = useState(false);
   const [msg, setMsg] = useState("");
 
-  async function load() {
+  // 游标分页：next 是后端给的完整 URL，取路径部分交给 authFetch
+  async function load(more = false) {
     setLoading(true);
     try {
-      const data = await authFetch("/api/deliveries?state=pending");
-      setList(data);
+      const path =
+        more && next
+          ? new URL(next).pathname + new URL(next).search
+          : "/api/deliveries/?state=pending";
+      const data = await authFetch(path);
+      const rows: Delivery[] = data.results ?? data;
+      setList(more ? (prev) => [...prev, ...rows] : rows);
+      setNext(data.next ?? null);
     } catch (e: any) {
       setMsg(e.message || "加载失败");
     } finally {
@@ -123,15 +132,38 @@ function Inbox() {
     load();
   }, []);
 
+  // 实时推送：有新公告/撤回时刷新列表，代替轮询（断线由 EventSource 自动重连）
+  useEffect(() => {
+    const es = new EventSource(
+      `${API_BASE}/api/notices/events?token=${encodeURIComponent(getToken())}`
+    );
+    const refresh = () => load();
+    es.addEventListener("announcement", refresh);
+    es.addEventListener("withdrawn", refresh);
+    return () => es.close();
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, []);
+
   async function delivered(id: number) {
     try {
-      await authFetch(`/api/deliveries/${id}/delivered/`, { method: "POST" });
+      await authFetch(`/api/announcements/${id}/delivered/`, { method: "POST" });
       await load();
     } catch {}
   }
+  async function ackAll() {
+    try {
+      await authFetch("/api/deliveries/bulk_ack/", {
+        method: "POST",
+        body: JSON.stringify({ all: true }),
+      });
+      await load();
+    } catch (e: any) {
+      alert(e.message || "确认失败");
+    }
+  }
   async function ack(id: number) {
     try {
-      await authFetch(`/api/deliveries/${id}/ack/`, { method: "POST" });
+      await authFetch(`/api/announcements/${id}/ack/`, { method: "POST" });
       await load();
     } catch (e: any) {
       alert(e.message || "确认失败");
@@ -142,11 +174,16 @@ function Inbox() {
     <section className="space-y-3">
       <div className="flex items-center gap-3">
         <button
-          onClick={load}
+          onClick={() => load()}
           className="px-3 py-2 bg-black text-white rounded"
         >
           刷新
         </button>
+        {list.length > 0 && (
+          <button onClick={ackAll} className="px-3 py-2 border rounded">
+            全部确认
+          </button>
+        )}
         {loading && <span className="text-gray-500">加载中…</span>}
         {msg && <span className="text-sm text-red-600">{msg}</span>}
       </div>
@@ -162,7 +199,7 @@ function Inbox() {
         </thead>
         <tbody>
           {list.map((d) => (
-            <tr key={d.id} className="border-t">
+            <tr key={d.announcement} className="border-t">
               <td className="p-2">{d.announcement_title}</td>
               <td className="p-2">{d.publisher}</td>
               <td className="p-2">
@@ -178,7 +215,7 @@ function Inbox() {
               <td className="p-2 space-x-3">
                 {d.state === "queued" && (
                   <button
-                    onClick={() => delivered(d.id)}
+                    onClick={() => delivered(d.announcement)}
                     className="text-blue-600 underline"
                   >
                     标记已展示
@@ -186,7 +223,7 @@ function Inbox() {
                 )}
                 {d.state !== "acknowledged" && (
                   <button
-                    onClick={() => ack(d.id)}
+                    onClick={() => ack(d.announcement)}
                     className="text-green-700 underline"
                   >
                     确认已读
@@ -204,22 +241,38 @@ function Inbox() {
           )}
         </tbody>
       </table>
+      {next && (
+        <button
+          onClick={() => load(true)}
+          className="px-3 py-2 border rounded"
+        >
+          加载更多
+        </button>
+      )}
     </section>
   );
 }
 
 function Mine({ canWrite }: { canWrite: boolean }) {
   const [list, setList] = useState<Announcement[]>([]);
+  const [next, setNext] = useState<string | null>(null);
   const [title, setTitle] = useState("");
   const [body, setBody] = useState("");
+  const [publishAt, setPublishAt] = useState(""); // 留空即立即发布
   const [loading, setLoading] = useState(false);
   const [msg, setMsg] = useState("");
 
-  async function load() {
+  async function load(more = false) {
     setLoading(true);
     try {
-      const data = await authFetch("/api/announcements/?mine=1");
-      setList(data);
+      const path =
+        more && next
+          ? new URL(next).pathname + new URL(next).search
+          : "/api/announcements/?mine=1&with_stats=1";
+      const data = await authFetch(path);
+      const rows: Announcement[] = data.results ?? data;
+      setList(more ? (prev) => [...prev, ...rows] : rows);
+      setNext(data.next ?? null);
     } catch (e: any) {
       setMsg(e.message || "加载失败");
     } finally {
@@ -236,11 +289,16 @@ function Mine({ canWrite }: { canWrite: boolean }) {
     try {
       await authFetch("/api/announcements/", {
         method: "POST",
-        body: JSON.stringify({ title, body }),
+        body: JSON.stringify({
+          title,
+          body,
+          ...(publishAt ? { publish_at: new Date(publishAt).toISOString() } : {}),
+        }),
       });
       setTitle("");
       setBody("");
-      setMsg("✅ 已发布给全体学生");
+      setPublishAt("");
+      setMsg(publishAt ? "✅ 已定时，到点自动发布" : "✅ 已发布给全体学生");
       await load();
     } catch (e: any) {
       setMsg(e.message);
@@ -270,7 +328,7 @@ function Mine({ canWrite }: { canWrite: boolean }) {
       const r = await authFetch(`/api/announcements/${id}/remind_unacked/`, {
         method: "POST",
       });
-      alert(`已提醒：${r.reminded}`);
+      alert(`提醒已在后台发送（任务 ${r.task_id}）`);
     } catch (e: any) {
       alert(e.message);
     }
@@ -298,6 +356,15 @@ function Mine({ canWrite }: { canWrite: boolean }) {
             onChange={(e) => setBody(e.target.value)}
             required
           />
+          <label className="text-sm text-gray-600 flex items-center gap-2">
+            定时发布（可选）
+            <input
+              type="datetime-local"
+              className="border p-1 rounded"
+              value={publishAt}
+              onChange={(e) => setPublishAt(e.target.value)}
+            />
+          </label>
           <button className="bg-black text-white px-4 py-2 rounded w-fit">
             发布
           </button>
@@ -312,6 +379,7 @@ function Mine({ canWrite }: { canWrite: boolean }) {
               <th className="p-2 text-left">标题</th>
               <th className="p-2 text-left">状态</th>
               <th className="p-2 text-left">创建时间</th>
+              <th className="p-2 text-left">已确认</th>
               <th className="p-2">操作</th>
             </tr>
           </thead>
@@ -323,6 +391,9 @@ function Mine({ canWrite }: { canWrite: boolean }) {
                 <td className="p-2">
                   {new Date(a.created_at).toLocaleString()}
                 </td>
+                <td className="p-2">
+                  {a.stats ? `${a.stats.ack_count}/${a.stats.total}` : "-"}
+                </td>
                 <td className="p-2 space-x-3">
                   <button
                     onClick={() => stats(a.id)}
@@ -349,7 +420,7 @@ function Mine({ canWrite }: { canWrite: boolean }) {
             ))}
             {list.length === 0 && (
               <tr>
-                <td className="p-4 text-gray-500" colSpan={4}>
+                <td className="p-4 text-gray-500" colSpan={5}>
                   暂无发布
                 </td>
               </tr>
@@ -357,6 +428,14 @@ function Mine({ canWrite }: { canWrite: boolean }) {
           </tbody>
         </table>
       </div>
+      {next && (
+        <button
+          onClick={() => load(true)}
+          className="mt-3 px-3 py-2 border rounded"
+        >
+          加载更多
+        </button>
+      )}
     </section>
   );
 }
@@ -35,37 +35,32 @@ export default function CourseBulkIO({
     timerRef.current = setTimeout(() => setMsg(""), 2500);
   }
 
-  async function pollOnce(id: string) {
-    try {
-      const s = await authFetch(`/api/tasks/${id}`);
-      setTask(s);
-      if (s.state === "SUCCESS") {
-        if (s.result?.download_url) {
-          const url = resolveHref(s.result.download_url);
-          // 立即打开下载链接
-          window.open(url, "_blank", "noopener");
-          toast("✅ 导出完成，正在下载…");
-        } else {
-          toast("✅ 任务完成");
-        }
-        clearTimer();
-        setExporting(false);
-        setImporting(false);
-      } else if (s.state === "FAILURE") {
-        toast("❌ 任务失败：" + (s.error || ""));
-        clearTimer();
-        setExporting(false);
-        setImporting(false);
-      }
-    } catch (e: any) {
-      // 轮询失败不打断，下一轮再试
-      console.warn("poll error:", e?.message || e);
-    }
+  const esRef = useRef<EventSource | null>(null);
+  function closeStream() {
+    esRef.current?.close();
+    esRef.current = null;
   }
 
-  function clearTimer() {
-    if (timerRef.current) clearTimeout(timerRef.current);
-    timerRef.current = null;
+  function onStatus(s: NonNullable<TaskStatus>) {
+    setTask(s);
+    if (s.state === "SUCCESS") {
+      if (s.result?.download_url) {
+        const url = resolveHref(s.result.download_url);
+        // 立即打开下载链接
+        window.open(url, "_blank", "noopener");
+        toast("✅ 导出完成，正在下载…");
+      } else {
+        toast("✅ 任务完成");
+      }
+      closeStream();
+      setExporting(false);
+      setImporting(false);
+    } else if (s.state === "FAILURE") {
+      toast("❌ 任务失败：" + (s.error || ""));
+      closeStream();
+      setExporting(false);
+      setImporting(false);
+    }
   }
 
   // 导出
@@ -111,22 +106,21 @@ export default function CourseBulkIO({
     }
   }
 
-  // 轮询
+  // 订阅任务进度（SSE）：连接时先推快照，之后实时推送变化；断线由 EventSource 自动重连
   useEffect(() => {
     if (!taskId) return;
-    // 先拉一次，随后每2秒轮询
-    let active = true;
-    (async () => {
-      await pollOnce(taskId);
-      if (!active) return;
-      const id = setInterval(() => pollOnce(taskId), 2000);
-      // @ts-ignore
-      timerRef.current = id as any;
-    })();
-    return () => {
-      active = false;
-      clearTimer();
+    const es = new EventSource(
+      `${API_BASE}/api/tasks/events?ids=${encodeURIComponent(taskId)}&token=${encodeURIComponent(getToken())}`
+    );
+    esRef.current = es;
+    es.onmessage = (e) => {
+      try {
+        onStatus(JSON.parse(e.data));
+      } catch (err: any) {
+        console.warn("task event error:", err?.message || err);
+      }
     };
+    return () => es.close();
     // eslint-disable-next-line react-hooks/exhaustive-deps
   }, [taskId]);
 